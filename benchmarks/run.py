@@ -0,0 +1,239 @@
+"""
+Throughput benchmarks for the matcher, the worker and the marker generator.
+
+    python -m benchmarks.run --sizes 480p 1080p 4k --targets 1 4 16 --out bench.json
+
+Test videos are synthesized locally with cv2.VideoWriter; results are
+written as JSON so runs of different releases can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from src.matcher import FrameMatcher
+from src.scanner import load_targets
+
+SIZES = {
+    "480p": (854, 480),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+SAMPLE_BYTES = 256 << 20 # decoded frames kept in memory per resolution for the matcher benchmarks
+
+def make_slate(width, height, seed):
+    """
+    Returns a colour-bar slate; every seed gives different bar colours.
+    """
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 256, (8, 3), dtype=np.uint8)
+    bars = np.repeat(colors[np.newaxis], height, axis=0)
+    return cv2.resize(bars, (width, height), interpolation=cv2.INTER_NEAREST)
+
+def synthesize_video(path, size, frames, fps=25.0):
+    """
+    Writes a video of moving noise with the slate of seed 0 shown during
+    the middle third, like an ad block in a recording.
+    returns: (first, last) frame of the slate
+    """
+    width, height = size
+    rng = np.random.default_rng(1)
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width * 2, 3), dtype=np.uint8), (9, 9), 0)
+    slate = make_slate(width, height, 0)
+    first, last = frames // 3, 2 * frames // 3 - 1
+
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for f in range(frames):
+        if first <= f <= last:
+            out.write(slate)
+        else:
+            shift = (f * 7) % width
+            out.write(np.ascontiguousarray(background[:, shift:shift + width]))
+    out.release()
+    return first, last
+
+def write_targets(directory, size, count):
+    """
+    returns: dict of path -> alias of count slates, the first of which is in the video
+    """
+    targets = {}
+    for i in range(count):
+        path = os.path.join(directory, f"target_{size[0]}x{size[1]}_{i}.png")
+        cv2.imwrite(path, make_slate(size[0], size[1], i))
+        targets[path] = f"slate {i}"
+    return targets
+
+def sample_frames(path, budget=SAMPLE_BYTES):
+    """
+    Decodes evenly spaced frames of a video, as many as fit into budget
+    bytes, so 4K runs do not hold the whole video in memory.
+    returns: list of frames
+    """
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_bytes = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) * int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) * 3
+    count = max(1, min(total, budget // max(frame_bytes, 1)))
+    step = max(1, -(-total // count))
+    frames = []
+    for f in range(total):
+        if f % step:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def bench_compare(frames, target_data, count):
+    """
+    Frames per second of FrameMatcher.compare against every target.
+    count: frames to time, cycling through the sampled frames
+    """
+    matcher = FrameMatcher()
+    targets = list(target_data.values())
+    started = time.perf_counter()
+    for i in range(count):
+        for target in targets:
+            matcher.compare(frames[i % len(frames)], target)
+    return count / (time.perf_counter() - started)
+
+def bench_match(frames, target_data, options, count):
+    """
+    Frames per second of FrameMatcher.match with prepared targets.
+    count: frames to time, cycling through the sampled frames
+    """
+    matcher = FrameMatcher(**options)
+    prepared = matcher.prepare(target_data, frames[0].shape)
+    started = time.perf_counter()
+    for i in range(count):
+        matcher.match(frames[i % len(frames)], prepared)
+    return count / (time.perf_counter() - started)
+
+def bench_worker(video_path, target_images, frame_count, options, scan_options):
+    """
+    Frames per second of a serial FrameWorker.run, decoding included.
+    returns: (fps, number of ranges found)
+    """
+    from src.worker import FrameWorker
+    worker = FrameWorker([video_path], target_images, FrameMatcher(**options), scan_options=scan_options)
+    finished = []
+    worker.finished.connect(finished.append)
+    started = time.perf_counter()
+    worker.run()
+    elapsed = time.perf_counter() - started
+    ranges = sum(len(r) for r in finished[0].values()) if finished else 0
+    return frame_count / elapsed, ranges
+
+def bench_marker(video_path, target_path, first, last, directory, mode):
+    """
+    returns: wall time in seconds of MarkerGenerator.create_marker_file
+    """
+    from src.generator import MarkerGenerator
+    output = os.path.join(directory, f"markers_{mode}.mp4")
+    results = [{"start_frame": first, "end_frame": last, "target_path": target_path}]
+    started = time.perf_counter()
+    MarkerGenerator().create_marker_file(video_path, results, output, mode=mode)
+    elapsed = time.perf_counter() - started
+    if os.path.exists(output):
+        os.remove(output)
+    return elapsed
+
+MATCHERS = {
+    "plain": {},
+    "prefilter": {"prefilter": True},
+    "early_exit": {"early_exit": True},
+}
+
+def run_benchmarks(sizes=("480p", "1080p", "4k"), frames=120, target_counts=(1, 4, 16),
+                   marker_modes=("video", "audio", "both"), log=None):
+    """
+    Runs every benchmark for every size.
+    returns: dict with "environment" and a list of "results"
+    """
+    log = log or (lambda message: None)
+    directory = tempfile.mkdtemp(prefix="pyframecatcher-bench-")
+    results = []
+    try:
+        for name in sizes:
+            size = SIZES[name]
+            video = os.path.join(directory, f"video_{name}.avi")
+            log(f"Synthesizing {frames} frames at {name}")
+            first, last = synthesize_video(video, size, frames)
+            sampled = sample_frames(video)
+
+            for count in target_counts:
+                target_images = write_targets(directory, size, count)
+                target_data = load_targets(target_images)
+                base = {"resolution": name, "width": size[0], "height": size[1], "targets": count,
+                        "frames": frames, "sampled_frames": len(sampled)}
+
+                fps = bench_compare(sampled, target_data, frames)
+                results.append(dict(base, benchmark="compare", fps=fps))
+                log(f"{name} compare, {count} targets: {fps:.1f} fps")
+
+                for matcher, options in MATCHERS.items():
+                    fps = bench_match(sampled, target_data, options, frames)
+                    results.append(dict(base, benchmark="match", matcher=matcher, fps=fps))
+                    log(f"{name} match ({matcher}), {count} targets: {fps:.1f} fps")
+
+                # The worker with the GUI defaults, then with "Skip static frames" ticked
+                for static_gate, scan_options in ((False, {}), (True, {"static_tolerance": 0.5})):
+                    fps, ranges = bench_worker(video, target_images, frames, {"early_exit": True}, scan_options)
+                    results.append(dict(base, benchmark="worker", matcher="early_exit", static_gate=static_gate,
+                                        fps=fps, ranges=ranges))
+                    label = "worker, static gate" if static_gate else "worker"
+                    log(f"{name} {label}, {count} targets: {fps:.1f} fps")
+
+            target_path = next(iter(write_targets(directory, size, 1)))
+            for mode in marker_modes:
+                seconds = bench_marker(video, target_path, first, last, directory, mode)
+                results.append({"benchmark": "marker", "resolution": name, "width": size[0],
+                                "height": size[1], "frames": frames, "mode": mode, "seconds": seconds})
+                log(f"{name} marker ({mode}): {seconds:.2f}s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    environment = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+    return {"environment": environment, "results": results}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="PyFrameCatcher benchmarks")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES),
+                        help="video resolutions to benchmark")
+    parser.add_argument("--frames", type=int, default=120, help="frames per synthesized video")
+    parser.add_argument("--targets", type=int, nargs="+", default=[1, 4, 16], help="target counts")
+    parser.add_argument("--marker-modes", nargs="*", choices=["video", "audio", "both"],
+                        default=["video", "audio", "both"], help="marker export modes to time")
+    parser.add_argument("--out", help="write results as JSON to this file instead of stdout")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = run_benchmarks(args.sizes, args.frames, args.targets, args.marker_modes,
+                            log=lambda message: print(message, file=sys.stderr))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+FINGERPRINT_BLOCK = 1 << 20 # bytes hashed from the start, middle and end of a video
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pyframecatcher")
+
+def video_fingerprint(video_path):
+    """
+    Fingerprints a video by its size and three sampled blocks of content,
+    so renamed or copied files still hit the cache without hashing
+    gigabytes of video.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, size // 2, max(0, size - FINGERPRINT_BLOCK)):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+def image_hash(img, region=None):
+    """
+    Hashes decoded target pixels, so the same image under another path or
+    alias reuses cached results.
+    region: the target's (x, y, w, h) rectangle or mask image, if any
+    """
+    digest = hashlib.sha1(str(img.shape).encode())
+    digest.update(img.tobytes())
+    if hasattr(region, "tobytes"): # mask image
+        digest.update(str(region.shape).encode())
+        digest.update(region.tobytes())
+    elif region is not None:
+        digest.update(str(tuple(region)).encode())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    On-disk cache of per-target runs of consecutive matching frames.
+    Entries are keyed by video fingerprint, target image hash and the
+    matcher/scanner settings that influence which frames match.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.path = os.path.join(self.cache_dir, "results.sqlite")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._execute("""CREATE TABLE IF NOT EXISTS runs (
+                             video TEXT NOT NULL,
+                             target TEXT NOT NULL,
+                             settings TEXT NOT NULL,
+                             runs TEXT NOT NULL,
+                             PRIMARY KEY (video, target, settings))""")
+
+    def _execute(self, sql, params=()):
+        # A connection per call keeps the cache usable from any thread
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                return db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+    def get(self, video, target, settings):
+        """
+        returns: list of runs (dicts with start/end frame/time), or None
+        when not cached
+        """
+        rows = self._execute("SELECT runs FROM runs WHERE video = ? AND target = ? AND settings = ?",
+                             (video, target, settings))
+        if not rows:
+            return None
+        return json.loads(rows[0][0])
+
+    def put(self, video, target, settings, runs):
+        self._execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)",
+                      (video, target, settings, json.dumps(runs)))
+
+    def clear(self):
+        self._execute("DELETE FROM runs")
@@ -0,0 +1,196 @@
+"""
+Headless command-line scanner for batch and server use.
+
+    python -m src.cli scan --videos a.mp4 b.mp4 --targets intro=intro.png \
+        --threshold 0.05 --jobs 8 --out results.json
+
+    python -m src.cli index --videos a.mp4 b.mp4 --signature-dir sigs/
+
+Drives the same matching engine as the GUI without importing Qt.
+"""
+import argparse
+import json
+import os
+import sys
+from src.matcher import FrameMatcher
+from src.template_matcher import TemplateMatcher
+from src.cache import ResultCache
+from src.scanner import (VideoScanner, ParallelScanner, load_targets, load_regions, merge_results,
+                         parse_region)
+from src.signatures import build_signatures, signature_dir
+
+def parse_targets(specs):
+    """
+    Parses "alias=path" target specs; a bare path uses its file name as alias.
+    returns: dict of path -> alias, like MainWindow.images
+    """
+    targets = {}
+    for spec in specs:
+        alias, sep, path = spec.partition("=")
+        if not sep:
+            path, alias = spec, os.path.basename(spec)
+        targets[os.path.abspath(path)] = alias
+    return targets
+
+def parse_regions(specs, targets):
+    """
+    Parses "alias=x,y,w,h" or "alias=mask.png" region specs.
+    targets: dict of path -> alias, as returned by parse_targets
+    returns: dict of path -> region, like MainWindow.regions
+    """
+    paths = {alias: path for path, alias in targets.items()}
+    regions = {}
+    for spec in specs:
+        alias, _, region = spec.partition("=")
+        if alias not in paths:
+            raise ValueError(f"Region for unknown target: {alias}")
+        regions[paths[alias]] = parse_region(region)
+    return regions
+
+def parse_floats(value):
+    return tuple(float(v) for v in value.split(","))
+
+def parse_size(value):
+    width, _, height = value.lower().partition("x")
+    return (int(width), int(height))
+
+def add_source_arguments(parser):
+    parser.add_argument("--source", choices=["opencv", "ffmpeg"], default="opencv", help="frame decoder")
+    parser.add_argument("--scale", type=parse_size, metavar="WxH", help="ffmpeg source: decode at this size")
+    parser.add_argument("--gray", action="store_true", help="ffmpeg source: decode to grayscale")
+    parser.add_argument("--hwaccel", help="ffmpeg source: value for -hwaccel")
+    parser.add_argument("--threads", type=int, help="ffmpeg source: decoder threads")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="PyFrameCatcher headless scanner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="scan videos for target images")
+    scan.add_argument("--videos", nargs="+", required=True, help="video files to scan")
+    scan.add_argument("--targets", nargs="+", required=True, metavar="ALIAS=PATH",
+                      help="target images, optionally prefixed with an alias")
+    scan.add_argument("--region", nargs="+", default=[], metavar="ALIAS=X,Y,W,H|MASK",
+                      help="only compare these targets inside a rectangle or mask image")
+    scan.add_argument("--threshold", type=float, default=0.05, help="maximum difference ratio (default: 0.05)")
+    scan.add_argument("--out", help="write results as JSON to this file instead of stdout")
+    scan.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    scan.add_argument("--segments", type=int, default=1, help="split each long video into this many ranges")
+    scan.add_argument("--stride", type=int, default=1, help="compare every Nth frame and refine around hits")
+    scan.add_argument("--pipeline", type=int, default=0, help="size of the decode/match frame ring (0: off)")
+    scan.add_argument("--static-tolerance", type=float,
+                      help="reuse verdicts for frames whose thumbnail changed by at most this many levels")
+    scan.add_argument("--match-threads", type=int, default=1, help="match threads when pipelined")
+    scan.add_argument("--prefilter", action="store_true", help="reject frames on thumbnails first")
+    scan.add_argument("--early-exit", action="store_true",
+                      help="bound differences with tile sums and stop summing once a target is out of reach")
+    scan.add_argument("--index", action="store_true", help="look up targets in a perceptual-hash index")
+    scan.add_argument("--template", action="store_true",
+                      help="search targets as templates that may appear scaled or shifted")
+    scan.add_argument("--min-correlation", type=float, default=0.8, help="template mode: minimum correlation")
+    scan.add_argument("--scales", type=parse_floats, default=(1.0,), metavar="S1,S2,...",
+                      help="template mode: target sizes to search for (default: 1.0)")
+    scan.add_argument("--search-window", type=parse_floats, metavar="X,Y,W,H",
+                      help="template mode: part of the frame to search, in fractions of the frame")
+    scan.add_argument("--max-gap", type=int, default=0, help="join ranges separated by up to N missing frames")
+    scan.add_argument("--max-gap-time", type=float, help="join ranges separated by up to this many seconds")
+    scan.add_argument("--min-frames", type=int, default=1, help="drop ranges with fewer frames")
+    scan.add_argument("--min-duration", type=float, default=0.0, help="drop ranges shorter than this many seconds")
+    add_source_arguments(scan)
+    scan.add_argument("--cache-dir", help="reuse and store per-target matches in this directory")
+    scan.add_argument("--signature-dir", help="use frame signatures built by the index command")
+    scan.add_argument("--quiet", action="store_true", help="only print errors")
+
+    index = commands.add_parser("index", help="store per-frame signatures so new targets scan faster")
+    index.add_argument("--videos", nargs="+", required=True, help="video files to index")
+    index.add_argument("--signature-dir", required=True, help="directory to store the signatures in")
+    add_source_arguments(index)
+    index.add_argument("--quiet", action="store_true", help="only print errors")
+    return parser
+
+def source_options(args):
+    if args.source == "ffmpeg":
+        return {"scale": args.scale, "gray": args.gray, "hwaccel": args.hwaccel, "threads": args.threads}
+    return {}
+
+def scan_options(args):
+    options = {"stride": args.stride, "pipeline": args.pipeline, "match_threads": args.match_threads,
+               "source": args.source, "source_options": source_options(args),
+               "static_tolerance": args.static_tolerance}
+    if args.cache_dir:
+        options["cache"] = ResultCache(args.cache_dir)
+    if args.signature_dir:
+        options["signatures"] = args.signature_dir
+    return options
+
+def make_log(args):
+    def log(message):
+        if not args.quiet or message.startswith("Error"):
+            print(message, file=sys.stderr)
+    return log
+
+def run_scan(args):
+    log = make_log(args)
+    grouping = {"max_gap": args.max_gap, "max_gap_time": args.max_gap_time,
+                "min_frames": args.min_frames, "min_duration": args.min_duration}
+    if args.template:
+        matcher = TemplateMatcher(min_correlation=args.min_correlation, scales=args.scales,
+                                  search_window=args.search_window, **grouping)
+    else:
+        matcher = FrameMatcher(threshold=args.threshold, prefilter=args.prefilter, index=args.index,
+                               early_exit=args.early_exit, **grouping)
+    target_images = parse_targets(args.targets)
+    target_data = load_targets(target_images, log=log)
+    if not target_data:
+        log("Error: None of the target images could be loaded.")
+        return 1
+
+    options = scan_options(args)
+    if args.region:
+        try:
+            options["regions"] = load_regions(parse_regions(args.region, target_images), target_images, log=log,
+                                              target_data=target_data)
+        except ValueError as e:
+            log(f"Error: {str(e)}")
+            return 1
+    if args.jobs > 1 and (len(args.videos) > 1 or args.segments > 1):
+        scanner = ParallelScanner(matcher, target_images, args.jobs, segments=args.segments,
+                                  scan_options=options, log=log)
+        scanned = scanner.scan(args.videos)
+    else:
+        scanner = VideoScanner(matcher, target_data, log=log, **options)
+        scanned = [scanner.scan(path) for path in args.videos]
+    results = merge_results(target_data, scanned)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=4)
+        log(f"Results exported to {args.out}")
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+    return 0 if any(r is not None for r in scanned) else 1
+
+def run_index(args):
+    log = make_log(args)
+    failed = 0
+    for path in args.videos:
+        if not os.path.isfile(path):
+            log(f"Error: Could not open video {path}")
+            failed += 1
+            continue
+        store = build_signatures(path, signature_dir(args.signature_dir, path), source=args.source,
+                                 source_options=source_options(args), log=log)
+        if store is None:
+            failed += 1
+    return 1 if failed else 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "scan":
+        return run_scan(args)
+    if args.command == "index":
+        return run_index(args)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
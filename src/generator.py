@@ -1,9 +1,105 @@
+import bisect
 import cv2
 import numpy as np
+import heapq
 import os
+import shutil
 import subprocess
-import time
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtCore import QObject, pyqtSignal
+from src.probe import probe_cache
+
+def marker_segments(results, total_frames):
+    """
+    Splits the timeline of the marker video into stretches of one still.
+    Where ranges overlap, the later result wins.
+    results: list of dicts with start_frame, end_frame, target_path
+    returns: list of (target_path or None for black, start_frame, frame_count)
+    covering frames 0 to total_frames - 1
+    """
+    events = []
+    for i, r in enumerate(results):
+        start, end = max(0, r["start_frame"]), min(total_frames, r["end_frame"] + 1)
+        if start < end:
+            events.append((start, i))
+    events.sort()
+
+    segments = []
+    active = [] # heap of (-result index, end frame)
+    position, e = 0, 0
+    while position < total_frames:
+        while e < len(events) and events[e][0] <= position:
+            i = events[e][1]
+            heapq.heappush(active, (-i, min(total_frames, results[i]["end_frame"] + 1)))
+            e += 1
+        while active and active[0][1] <= position:
+            heapq.heappop(active)
+        next_start = events[e][0] if e < len(events) else total_frames
+        if active:
+            i, end = -active[0][0], active[0][1]
+            path, stop = results[i]["target_path"], min(end, next_start)
+        else:
+            path, stop = None, next_start
+        if segments and segments[-1][0] == path:
+            segments[-1] = (path, segments[-1][1], stop - segments[-1][1])
+        else:
+            segments.append((path, position, stop - position))
+        position = stop
+    return segments
+
+TONE_FREQUENCY = 1000
+TONE_DURATION = 0.1 # seconds
+TONE_AMPLITUDE = 1 / 8 # of full scale, like ffmpeg's sine source
+SAMPLE_RATE = 44100
+MAX_MARKER_JOBS = 2
+
+def tone_starts(results, fps):
+    """
+    returns: sorted start times in seconds of the beeps marking the start
+    and end of every range
+    """
+    starts = []
+    for r in results:
+        starts.append(int((r["start_frame"] / fps) * 1000) / 1000)
+        starts.append(max(0, int(((r["end_frame"] / fps) - TONE_DURATION) * 1000)) / 1000)
+    return sorted(starts)
+
+def write_tone_track(path, results, fps, duration, sample_rate=SAMPLE_RATE, chunk_seconds=60,
+                     should_continue=None):
+    """
+    Writes a 16-bit stereo WAV of silence with a short beep at the start and
+    end of every range. The track is rendered in chunks, so memory stays
+    bounded and the cost only depends on the duration.
+    returns: False if stopped through should_continue
+    """
+    should_continue = should_continue or (lambda: True)
+    total = int(round(duration * sample_rate))
+    tone_len = int(round(TONE_DURATION * sample_rate))
+    tone = np.sin(2 * np.pi * TONE_FREQUENCY * np.arange(tone_len) / sample_rate) * TONE_AMPLITUDE
+    starts = [int(round(t * sample_rate)) for t in tone_starts(results, fps)]
+    chunk_len = max(1, int(chunk_seconds * sample_rate))
+
+    with wave.open(path, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        for chunk_start in range(0, total, chunk_len):
+            if not should_continue():
+                return False
+            chunk_end = min(total, chunk_start + chunk_len)
+            chunk = np.zeros(chunk_end - chunk_start, np.float64)
+            # Beeps that overlap this chunk; overlapping beeps add up
+            first = bisect.bisect_right(starts, chunk_start - tone_len)
+            last = bisect.bisect_left(starts, chunk_end)
+            for start in starts[first:last]:
+                lo, hi = max(start, chunk_start), min(start + tone_len, chunk_end)
+                chunk[lo - chunk_start:hi - chunk_start] += tone[lo - start:hi - start]
+            samples = np.clip(np.round(chunk * 32767), -32768, 32767).astype("<i2")
+            out.writeframes(np.repeat(samples, 2).tobytes())
+    return True
 
 class MarkerGenerator(QObject):
     progress = pyqtSignal(int)
@@ -17,148 +113,145 @@ class MarkerGenerator(QObject):
         self.stop_requested = True
 
     def get_video_properties(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Could not open video file: {video_path}")
-        
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        cap.release()
-        return {
-            "width": width,
-            "height": height,
-            "fps": fps,
-            "total_frames": total_frames
-        }
-
-    def create_marker_file(self, source_video, results, output_path, mode="both"):
         """
+        returns: metadata record of the video from the shared probe cache,
+        see src.probe
+        """
+        return probe_cache.get(video_path)
+
+    def create_marker_file(self, source_video, results, output_path, mode="both", video_info=None):
+        """
+        Encodes the marker file in a single ffmpeg run. The video is described
+        as segments of black and still images that ffmpeg renders from a
+        concat list, so the cost grows with the number of ranges rather than
+        the length of the video. The tone track is written as a WAV first
+        and muxed in the same run.
         results: list of dicts with start_frame, end_frame, target_path
         mode: "video", "audio", or "both"
+        video_info: metadata record of source_video captured by the scan;
+                    looked up in the probe cache if None
+        returns: True if the marker file was created
         """
         self.stop_requested = False
-        props = self.get_video_properties(source_video)
+        return self._encode(source_video, results, output_path, mode, video_info)
+
+    def _encode(self, source_video, results, output_path, mode, video_info):
+        # Keeps a stop requested before the start, see BatchMarkerGenerator
+        props = video_info or self.get_video_properties(source_video)
         width, height = props["width"], props["height"]
         fps = props["fps"]
         total_frames = props["total_frames"]
+        with_video = mode in ["video", "both"]
+        with_audio = mode in ["audio", "both"]
 
-        temp_video = "temp_marker_video.mp4"
-        temp_audio = "temp_marker_audio.wav"
-
-        # 1. Generate Video if needed
-        if mode in ["video", "both"]:
-            self.log.emit("Generating marker video frames...")
-            # Use 'mp4v' or 'avc1'
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(temp_video, fourcc, fps, (width, height))
-
-            # Pre-load and resize images
-            target_images = {}
-            for r in results:
-                if self.stop_requested: break
-                t_path = r["target_path"]
-                if t_path not in target_images:
-                    img = cv2.imread(t_path)
-                    if img is not None:
-                        # Resize/letterbox to fit video
-                        target_images[t_path] = self._resize_to_fit(img, width, height)
-
-            # Map frames to images for fast lookup
-            frame_map = {}
-            for r in results:
-                if self.stop_requested: break
-                for f in range(r["start_frame"], r["end_frame"] + 1):
-                    frame_map[f] = r["target_path"]
-
-            black_frame = np.zeros((height, width, 3), np.uint8)
-            for f in range(total_frames):
-                if self.stop_requested: break
-                if f in frame_map:
-                    img_path = frame_map[f]
-                    if img_path in target_images:
-                        out.write(target_images[img_path])
-                    else:
-                        out.write(black_frame)
-                else:
-                    out.write(black_frame)
-                
-                if f % 100 == 0:
-                    self.progress.emit(int((f / total_frames) * 50)) # First 50% for video
-
-            out.release()
+        work_dir = tempfile.mkdtemp(prefix="pyframecatcher-markers-")
+        try:
+            cmd = ["ffmpeg", "-y", "-nostats", "-loglevel", "error", "-progress", "pipe:1"]
+            if with_video:
+                self.log.emit("Preparing marker video segments...")
+                segments = marker_segments(results, total_frames)
+                stills = self._write_stills(segments, work_dir, width, height)
+                concat_list = self._write_concat_list(segments, stills, fps, work_dir)
+                cmd.extend(["-f", "concat", "-safe", "0", "-i", concat_list])
+            if with_audio:
+                self.log.emit("Generating audio tones...")
+                tone_track = os.path.join(work_dir, "tones.wav")
+                if not write_tone_track(tone_track, results, fps, total_frames / fps,
+                                        should_continue=lambda: not self.stop_requested):
+                    return False
+                cmd.extend(["-i", tone_track])
+            if with_video:
+                cmd.extend(["-map", "0:v", "-vf", f"fps={fps}", "-frames:v", str(total_frames),
+                            "-c:v", "libx264", "-pix_fmt", "yuv420p"])
+            if with_audio:
+                cmd.extend(["-map", f"{1 if with_video else 0}:a"])
+                if with_video:
+                    cmd.extend(["-c:a", "aac", "-shortest"])
+            cmd.append(output_path)
+
+            if self.stop_requested: return False
+            self.log.emit("Encoding marker file...")
+            return self._run_ffmpeg(cmd, output_path, total_frames if with_video else 0)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _run_ffmpeg(self, cmd, output_path, total_frames):
+        """
+        Runs ffmpeg, reporting progress from its -progress output.
+        total_frames: frames to be encoded, or 0 if there is no video
+        returns: True if ffmpeg succeeded
+        """
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            self.log.emit(f"FFmpeg Error: {str(e)}")
+            return False
+
+        for line in proc.stdout:
             if self.stop_requested:
-                if os.path.exists(temp_video): os.remove(temp_video)
-                return
-            self.log.emit("Marker video frames generated.")
-
-        if self.stop_requested: return
-
-        # 2. Generate Audio if needed
-        if mode in ["audio", "both"]:
-            self.log.emit("Generating audio tones...")
-            duration = total_frames / fps
-            
-            tone_cmd = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"anullsrc=r=44100:cl=stereo:d={duration}"]
-            
-            filter_str = ""
-            inputs = ["[0:a]"]
-            for i, r in enumerate(results):
-                if self.stop_requested: break
-                s_t_ms = int((r["start_frame"] / fps) * 1000)
-                e_t_ms = int(((r["end_frame"] / fps) - 0.1) * 1000)
-                e_t_ms = max(0, e_t_ms)
-                
-                filter_str += f"sine=f=1000:d=0.1,adelay={s_t_ms}|{s_t_ms}[s{i}];"
-                filter_str += f"sine=f=1000:d=0.1,adelay={e_t_ms}|{e_t_ms}[e{i}];"
-                inputs.append(f"[s{i}]")
-                inputs.append(f"[e{i}]")
-            
-            if results and not self.stop_requested:
-                filter_str += "".join(inputs) + f"amix=inputs={len(inputs)}:normalize=0[aout]"
-                tone_cmd.extend(["-filter_complex", filter_str, "-map", "[aout]"])
-            
-            tone_cmd.append(temp_audio)
-            
-            if not self.stop_requested:
-                try:
-                    subprocess.run(tone_cmd, check=True, capture_output=True)
-                    self.log.emit("Audio tones generated.")
-                except subprocess.CalledProcessError as e:
-                    self.log.emit(f"FFmpeg Audio Error: {e.stderr.decode()}")
-                    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", f"anullsrc=r=44100:cl=stereo:d={duration}", temp_audio], check=True)
-
-            self.progress.emit(75 if mode == "both" else 100)
-
-        if self.stop_requested:
-            if os.path.exists(temp_video): os.remove(temp_video)
-            if os.path.exists(temp_audio): os.remove(temp_audio)
-            return
-
-        # 3. Muxing
-        self.log.emit("Finalizing output file...")
-        final_cmd = ["ffmpeg", "-y"]
-        
-        if mode == "video":
-            final_cmd.extend(["-i", temp_video, "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path])
-        elif mode == "audio":
-            final_cmd.extend(["-i", temp_audio, output_path])
-        else: # both
-            final_cmd.extend(["-i", temp_video, "-i", temp_audio, "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", output_path])
-
-        if not self.stop_requested:
-            try:
-                subprocess.run(final_cmd, check=True, capture_output=True)
-                self.log.emit(f"Marker file created successfully: {output_path}")
-            except subprocess.CalledProcessError as e:
-                self.log.emit(f"FFmpeg Muxing Error: {e.stderr.decode()}")
-            finally:
-                if os.path.exists(temp_video): os.remove(temp_video)
-                if os.path.exists(temp_audio): os.remove(temp_audio)
+                proc.kill()
+                proc.wait()
+                if os.path.exists(output_path): os.remove(output_path)
+                return False
+            key, _, value = line.strip().partition("=")
+            if key == "frame" and total_frames > 0 and value.isdigit():
+                self.progress.emit(min(99, int(int(value) / total_frames * 100)))
 
+        error = proc.stderr.read()
+        success = proc.wait() == 0
+        if success:
+            self.log.emit(f"Marker file created successfully: {output_path}")
+        else:
+            self.log.emit(f"FFmpeg Error: {error}")
         self.progress.emit(100)
+        return success
+
+    def _write_stills(self, segments, directory, width, height):
+        """
+        Writes a letterboxed PNG of every target used by the segments, plus a
+        black one for the gaps.
+        returns: dict of target_path -> file name in directory; targets that
+        cannot be read map to the black still
+        """
+        cv2.imwrite(os.path.join(directory, "black.png"), np.zeros((height, width, 3), np.uint8))
+        stills = {None: "black.png"}
+        for path, _, _ in segments:
+            if path in stills:
+                continue
+            img = cv2.imread(path)
+            if img is None:
+                stills[path] = "black.png"
+                continue
+            name = f"still_{len(stills)}.png"
+            cv2.imwrite(os.path.join(directory, name), self._resize_to_fit(img, width, height))
+            stills[path] = name
+        return stills
+
+    def _write_concat_list(self, segments, stills, fps, directory):
+        """
+        Writes the ffconcat list that shows every still for its segment.
+        returns: path of the list
+        """
+        lines = ["ffconcat version 1.0"]
+        name = stills[None]
+        for path, start, count in segments:
+            name = stills[path]
+            # Differences of rounded boundaries, so rounding never accumulates
+            duration = round((start + count) / fps, 6) - round(start / fps, 6)
+            # Stills default to 25 fps, which would snap every boundary to a
+            # 1/25 s grid; at the source rate they land on exact frames
+            lines.append(f"file '{name}'")
+            lines.append(f"option framerate {fps}")
+            lines.append(f"duration {duration:.6f}")
+        # The duration of the last entry only counts if a file follows it
+        lines.append(f"file '{name}'")
+        lines.append(f"option framerate {fps}")
+
+        list_path = os.path.join(directory, "segments.ffconcat")
+        with open(list_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return list_path
 
     def _resize_to_fit(self, img, width, height):
         h, w = img.shape[:2]
@@ -171,3 +264,74 @@ class MarkerGenerator(QObject):
         y_offset = (height - new_h) // 2
         canvas[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized
         return canvas
+
+class BatchMarkerGenerator(QObject):
+    """
+    Creates the marker files of several videos with a bounded number of
+    concurrent ffmpeg jobs and reports their combined progress.
+    """
+    progress = pyqtSignal(int)
+    log = pyqtSignal(str)
+
+    def __init__(self, max_jobs=MAX_MARKER_JOBS):
+        """
+        max_jobs: marker files encoded at the same time; every ffmpeg job
+                  already uses several threads
+        """
+        super().__init__()
+        self.max_jobs = max(1, max_jobs)
+        self.stop_requested = False
+        self.generators = []
+        self.lock = threading.Lock()
+
+    def stop(self):
+        with self.lock:
+            self.stop_requested = True
+            for generator in self.generators:
+                generator.stop()
+
+    def create_marker_files(self, jobs, mode="both"):
+        """
+        jobs: list of (source_video, results, output_path, video_info), see
+              MarkerGenerator.create_marker_file
+        mode: "video", "audio", or "both"
+        returns: number of marker files created
+        """
+        self.stop_requested = False
+        job_progress = [0] * len(jobs)
+
+        def report(index, value):
+            with self.lock:
+                job_progress[index] = value
+                total = sum(job_progress) // len(jobs)
+            self.progress.emit(total)
+
+        def run(index):
+            source_video, results, output_path, video_info = jobs[index]
+            generator = MarkerGenerator()
+            if len(jobs) > 1:
+                name = os.path.basename(source_video)
+                generator.log.connect(lambda message: self.log.emit(f"[{name}] {message}"))
+            else:
+                generator.log.connect(self.log.emit)
+            generator.progress.connect(lambda value: report(index, value))
+            with self.lock:
+                if self.stop_requested:
+                    return False
+                self.generators.append(generator)
+            try:
+                # A stop of the batch may reach the generator before it starts
+                return generator._encode(source_video, results, output_path, mode, video_info)
+            except ValueError as e:
+                self.log.emit(f"Error: {str(e)}")
+                return False
+            finally:
+                with self.lock:
+                    self.generators.remove(generator)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_jobs, max(1, len(jobs)))) as pool:
+            created = sum(1 for ok in pool.map(run, range(len(jobs))) if ok)
+        if len(jobs) > 1:
+            self.log.emit(f"Created {created} of {len(jobs)} marker files.")
+        self.progress.emit(100)
+        return created
@@ -2,7 +2,7 @@ from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QListWidget, QPushButton, QLabel, QProgressBar, QTextEdit,
     QFileDialog, QListWidgetItem, QInputDialog, QTableWidget, QTableWidgetItem,
-    QHeaderView, QDialog, QComboBox, QFormLayout, QStatusBar, QApplication
+    QHeaderView, QDialog, QComboBox, QFormLayout, QStatusBar, QApplication, QCheckBox
 )
 from PyQt6.QtCore import Qt, QPropertyAnimation, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QGuiApplication, QPalette
@@ -10,22 +10,43 @@ import os
 import csv
 import json
 import time
+import cv2
 from src.worker import FrameWorker
 from src.matcher import FrameMatcher
-from src.generator import MarkerGenerator
+from src.generator import BatchMarkerGenerator
+from src.cache import ResultCache
+from src.scanner import parse_region, region_error
+
+def marker_file_names(videos, ext):
+    """
+    returns: one "<video>_markers<ext>" file name per video; videos sharing
+    a file name get their folder name prepended, then a number if needed
+    """
+    stems = [os.path.splitext(os.path.basename(v))[0] for v in videos]
+    names = []
+    for video, stem in zip(videos, stems):
+        if stems.count(stem) > 1:
+            folder = os.path.basename(os.path.dirname(os.path.abspath(video)))
+            stem = f"{folder}_{stem}" if folder else stem
+        name, n = f"{stem}_markers{ext}", 2
+        while name in names:
+            name, n = f"{stem}_markers_{n}{ext}", n + 1
+        names.append(name)
+    return names
 
 class MarkerWorker(QThread):
     progress = pyqtSignal(int)
     log = pyqtSignal(str)
     finished = pyqtSignal()
 
-    def __init__(self, source_video, results, output_path, mode):
+    def __init__(self, jobs, mode):
+        """
+        jobs: list of (source_video, results, output_path, video_info)
+        """
         super().__init__()
-        self.source_video = source_video
-        self.results = results
-        self.output_path = output_path
+        self.jobs = jobs
         self.mode = mode
-        self.generator = MarkerGenerator()
+        self.generator = BatchMarkerGenerator()
 
     def stop(self):
         self.generator.stop()
@@ -33,7 +54,7 @@ class MarkerWorker(QThread):
     def run(self):
         self.generator.progress.connect(self.progress.emit)
         self.generator.log.connect(self.log.emit)
-        self.generator.create_marker_file(self.source_video, self.results, self.output_path, self.mode)
+        self.generator.create_marker_files(self.jobs, self.mode)
         self.finished.emit()
 
 class MainWindow(QMainWindow):
@@ -44,7 +65,8 @@ class MainWindow(QMainWindow):
 
         self.videos = []
         self.images = {} # path -> alias
-        self.matcher = FrameMatcher()
+        self.regions = {} # path -> (x, y, w, h) or mask image path
+        self.matcher = FrameMatcher(early_exit=True)
         self.worker = None
         self.marker_worker = None
         self.last_results = {}
@@ -88,9 +110,15 @@ class MainWindow(QMainWindow):
         self.image_list = QListWidget()
         self.image_list.itemDoubleClicked.connect(self.edit_alias)
         image_layout.addWidget(self.image_list)
+        image_buttons = QHBoxLayout()
         self.add_image_btn = QPushButton("Add Images")
         self.add_image_btn.clicked.connect(self.add_images)
-        image_layout.addWidget(self.add_image_btn)
+        image_buttons.addWidget(self.add_image_btn)
+        self.region_btn = QPushButton("Set Region")
+        self.region_btn.setToolTip("Only compare part of the frame, e.g. a channel logo")
+        self.region_btn.clicked.connect(self.edit_region)
+        image_buttons.addWidget(self.region_btn)
+        image_layout.addLayout(image_buttons)
         selection_layout.addLayout(image_layout)
 
         main_layout.addLayout(selection_layout)
@@ -120,6 +148,25 @@ class MainWindow(QMainWindow):
         self.stop_btn.setEnabled(False)
         controls_layout.addWidget(self.stop_btn)
 
+        self.static_check = QCheckBox("Skip static frames")
+        self.static_check.setToolTip("Reuse the last verdicts while the picture does not change; "
+                                     "not used for targets with a region")
+        controls_layout.addWidget(self.static_check)
+
+        self.parallel_check = QCheckBox("Use all CPU cores")
+        self.parallel_check.setToolTip("Scan in several processes; faster for many or long videos, "
+                                       "but matches are only reported once each video is done")
+        controls_layout.addWidget(self.parallel_check)
+
+        self.cache_check = QCheckBox("Reuse earlier results")
+        self.cache_check.setToolTip("Skip targets already scanned in the same video with the same settings; "
+                                    "clear the results if a video was edited in place")
+        controls_layout.addWidget(self.cache_check)
+
+        self.clear_cache_btn = QPushButton("Clear Results")
+        self.clear_cache_btn.clicked.connect(self.clear_cache)
+        controls_layout.addWidget(self.clear_cache_btn)
+
         controls_layout.addStretch()
         main_layout.addLayout(controls_layout)
 
@@ -425,7 +472,46 @@ class MainWindow(QMainWindow):
         new_alias, ok = QInputDialog.getText(self, "Edit Alias", "Alias:", text=old_alias)
         if ok and new_alias:
             self.images[file] = new_alias
-            item.setText(f"{new_alias} ({file})")
+            item.setText(self.image_label(file))
+
+    def image_label(self, file):
+        label = f"{self.images[file]} ({file})"
+        region = self.regions.get(file)
+        if isinstance(region, tuple):
+            label += " [region {},{} {}x{}]".format(*region)
+        elif region:
+            label += f" [mask {os.path.basename(region)}]"
+        return label
+
+    def edit_region(self):
+        item = self.image_list.currentItem()
+        if item is None:
+            self.add_log("Select a target image to set its region.")
+            return
+        file = item.data(Qt.ItemDataRole.UserRole)
+        current = self.regions.get(file)
+        text = ",".join(str(v) for v in current) if isinstance(current, tuple) else current or ""
+        text, ok = QInputDialog.getText(self, "Set Region",
+                                        "Rectangle x,y,w,h in image pixels or mask image path\n"
+                                        "(empty: compare the whole frame):", text=text)
+        if not ok:
+            return
+        region = parse_region(text)
+        if isinstance(region, str) and not os.path.exists(region):
+            self.add_log(f"WARNING: Mask image does not exist: {region}")
+            return
+        if region is not None:
+            image = cv2.imread(file)
+            checked = cv2.imread(region, cv2.IMREAD_GRAYSCALE) if isinstance(region, str) else region
+            error = region_error(checked, image.shape) if image is not None and checked is not None else None
+            if error:
+                self.add_log(f"WARNING: Region not set: {error}")
+                return
+        if region is None:
+            self.regions.pop(file, None)
+        else:
+            self.regions[file] = region
+        item.setText(self.image_label(file))
 
     def start_processing(self):
         if not self.videos or not self.images:
@@ -438,6 +524,7 @@ class MainWindow(QMainWindow):
         self.stop_btn.setEnabled(True)
         self.add_video_btn.setEnabled(False)
         self.add_image_btn.setEnabled(False)
+        self.region_btn.setEnabled(False)
         self.export_csv_btn.setEnabled(False)
         self.export_json_btn.setEnabled(False)
         self.gen_video_btn.setEnabled(False)
@@ -450,7 +537,23 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("Processing videos...")
         self.shimmer_timer.start(50) # 20 FPS shimmer
 
-        self.worker = FrameWorker(self.videos, self.images, self.matcher)
+        scan_options = {}
+        if self.static_check.isChecked():
+            # Static stretches of broadcast recordings reuse the last verdicts
+            scan_options["static_tolerance"] = 0.5
+        if self.cache_check.isChecked():
+            try:
+                scan_options["cache"] = ResultCache()
+            except OSError as e:
+                self.add_log(f"WARNING: Result cache unavailable: {str(e)}")
+
+        # Scanning in this process streams every range as soon as it closes
+        processes, segments = 1, 1
+        if self.parallel_check.isChecked():
+            processes = os.cpu_count() or 1
+            segments = max(1, processes // len(self.videos))
+        self.worker = FrameWorker(self.videos, self.images, self.matcher, processes=processes,
+                                  segments=segments, scan_options=scan_options, regions=self.regions)
         self.worker.progress.connect(self.update_progress)
         self.worker.log.connect(self.add_log)
         self.worker.finished.connect(self.processing_finished)
@@ -481,6 +584,14 @@ class MainWindow(QMainWindow):
             self.shimmer_timer.stop()
             self.status_bar.showMessage("Processing stopped.")
 
+    def clear_cache(self):
+        try:
+            ResultCache().clear()
+        except OSError as e:
+            self.add_log(f"WARNING: Could not clear results: {str(e)}")
+            return
+        self.add_log("Cleared earlier results.")
+
     def update_progress(self, value):
         self.progress_animation.stop()
         self.progress_animation.setEndValue(value)
@@ -500,6 +611,7 @@ class MainWindow(QMainWindow):
         self.stop_btn.setEnabled(False)
         self.add_video_btn.setEnabled(True)
         self.add_image_btn.setEnabled(True)
+        self.region_btn.setEnabled(True)
         self.shimmer_timer.stop()
         self.apply_theme() # Refresh theme and reset progress bar style
         
@@ -516,25 +628,31 @@ class MainWindow(QMainWindow):
         if not self.last_results:
             return
 
-        source_video = None
+        source_videos = []
         for alias, ranges in self.last_results.items():
-            if ranges:
-                source_video = ranges[0].get('video_path')
-                break
+            for r in ranges:
+                video_path = r.get('video_path')
+                if video_path and video_path not in source_videos:
+                    source_videos.append(video_path)
         
-        if not source_video:
+        if not source_videos:
             if self.videos:
-                source_video = self.videos[0]
+                source_videos = [self.videos[0]]
             else:
                 self.add_log("Error: No source video found for marker generation.")
                 return
 
-        # Prepare output path
+        # Prepare output paths: one file, or a folder for all videos of the scan
         ext = ".mp4" if mode != "audio" else ".wav"
-        default_name = os.path.splitext(os.path.basename(source_video))[0] + "_markers" + ext
-        path, _ = QFileDialog.getSaveFileName(self, f"Save {mode.capitalize()} Marker File", default_name, f"Files (*{ext})")
+        default_names = marker_file_names(source_videos, ext)
+        if len(source_videos) == 1:
+            path, _ = QFileDialog.getSaveFileName(self, f"Save {mode.capitalize()} Marker File", default_names[0], f"Files (*{ext})")
+            output_paths = [path] if path else []
+        else:
+            directory = QFileDialog.getExistingDirectory(self, f"Save {mode.capitalize()} Marker Files")
+            output_paths = [os.path.join(directory, name) for name in default_names] if directory else []
         
-        if path:
+        if output_paths:
             self.start_btn.setEnabled(False)
             self.gen_video_btn.setEnabled(False)
             self.gen_audio_btn.setEnabled(False)
@@ -545,31 +663,52 @@ class MainWindow(QMainWindow):
             
             self.progress_bar.setValue(0)
             self.start_time = time.time()
-            self.status_bar.showMessage(f"Generating {mode} markers...")
-
-            # Flatten results for the generator
-            flat_results = []
-            for alias, ranges in self.last_results.items():
-                target_path = None
-                for p, a in self.images.items():
-                    if a == alias:
-                        target_path = p
-                        break
-                
-                for r in ranges:
-                    if r.get('video_path') == source_video or not r.get('video_path'):
-                        flat_results.append({
-                            "start_frame": r['start_frame'],
-                            "end_frame": r['end_frame'],
-                            "target_path": target_path
-                        })
-
-            self.marker_worker = MarkerWorker(source_video, flat_results, path, mode)
+            if len(output_paths) > 1:
+                self.status_bar.showMessage(f"Generating {mode} markers for {len(output_paths)} videos...")
+            else:
+                self.status_bar.showMessage(f"Generating {mode} markers...")
+
+            jobs = [(source_video, self.marker_results(source_video), path, self.video_info(source_video))
+                    for source_video, path in zip(source_videos, output_paths)]
+            self.marker_worker = MarkerWorker(jobs, mode)
             self.marker_worker.progress.connect(self.update_progress)
             self.marker_worker.log.connect(self.add_log)
             self.marker_worker.finished.connect(self.marker_generation_finished)
             self.marker_worker.start()
 
+    def video_info(self, source_video):
+        """
+        returns: the metadata record the scan attached to the results of a
+        video, or None
+        """
+        for ranges in self.last_results.values():
+            for r in ranges:
+                if r.get('video_path') == source_video and r.get('video_info'):
+                    return r['video_info']
+        return None
+
+    def marker_results(self, source_video):
+        """
+        Flattens the results of one video for the generator.
+        returns: list of dicts with start_frame, end_frame, target_path
+        """
+        flat_results = []
+        for alias, ranges in self.last_results.items():
+            target_path = None
+            for p, a in self.images.items():
+                if a == alias:
+                    target_path = p
+                    break
+            
+            for r in ranges:
+                if r.get('video_path') == source_video or not r.get('video_path'):
+                    flat_results.append({
+                        "start_frame": r['start_frame'],
+                        "end_frame": r['end_frame'],
+                        "target_path": target_path
+                    })
+        return flat_results
+
     def stop_marker_generation(self):
         if self.marker_worker:
             self.marker_worker.stop()
@@ -1,12 +1,309 @@
 import cv2
+import copy
+import json
 import numpy as np
+from src.target_index import TargetIndex
+
+THUMB_SIZE = (32, 18) # (width, height) of prefilter thumbnails
+
+# Rounding the uint8 thumbnails can shift each one by up to half a level,
+# so the thumbnail difference may exceed the true one by at most one level.
+THUMB_ROUNDING_SLACK = 1.0
+
+TILE_GRID = (8, 8) # (rows, columns) of tiles for early-exit comparison
+
+def make_thumbnail(img, size=THUMB_SIZE):
+    """
+    Returns a tiny float32 grayscale thumbnail of img.
+    Channels are averaged with equal weights and pixels are area-averaged,
+    so the mean thumbnail difference of two images never exceeds their
+    full-resolution mean difference (plus THUMB_ROUNDING_SLACK).
+    """
+    thumb = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        return thumb.mean(axis=2, dtype=np.float32)
+    return thumb.astype(np.float32)
+
+class TargetRegion:
+    """
+    A target compared only inside a rectangle or mask of the frame.
+    image: the target, already fitted to the frame geometry
+    region: (x, y, w, h) rectangle in the pixels of the original target
+            image, or a mask image whose non-zero pixels are compared
+    source_shape: shape of the original target image
+    """
+    def __init__(self, alias, image, region, source_shape):
+        self.alias = alias
+        height, width = image.shape[:2]
+        if isinstance(region, np.ndarray):
+            mask = region if region.ndim == 2 else cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+            mask = (cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST) > 0).astype(np.uint8)
+            x, y, w, h = cv2.boundingRect(mask)
+            self.mask = np.ascontiguousarray(mask[y:y + h, x:x + w])
+        else:
+            sx, sy = width / source_shape[1], height / source_shape[0]
+            rx, ry, rw, rh = region
+            x, y = max(0, int(round(rx * sx))), max(0, int(round(ry * sy)))
+            w = min(width, int(round((rx + rw) * sx))) - x
+            h = min(height, int(round((ry + rh) * sy))) - y
+            self.mask = None
+        if w <= 0 or h <= 0:
+            raise ValueError("the region is empty at the frame size")
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.image = np.ascontiguousarray(image[y:y + h, x:x + w])
+
+    def score(self, frame):
+        """
+        returns: mean difference ratio inside the region (0.0 to 1.0)
+        """
+        diff = cv2.absdiff(frame[self.y:self.y + self.h, self.x:self.x + self.w], self.image)
+        if self.mask is None:
+            return np.mean(diff) / 255.0
+        channels = diff.shape[2] if diff.ndim == 3 else 1
+        return np.mean(cv2.mean(diff, self.mask)[:channels]) / 255.0
+
+def tile_starts(frame_shape, grid=TILE_GRID):
+    """
+    returns: (first row of every tile row, first column of every tile column)
+    """
+    rows = np.unique(np.linspace(0, frame_shape[0], grid[0] + 1).astype(int)[:-1])
+    cols = np.unique(np.linspace(0, frame_shape[1], grid[1] + 1).astype(int)[:-1])
+    return rows, cols
+
+def tile_sums(img, rows, cols):
+    """
+    returns: (tile rows, tile columns, channels) int64 pixel sums of img
+    """
+    height, width = img.shape[:2]
+    ends = list(rows[1:]) + [height]
+    sums = []
+    for start, end in zip(rows, ends):
+        # Column sums of the tile row, then summed per tile column
+        columns = cv2.reduce(img[start:end].reshape(end - start, -1), 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S)
+        sums.append(np.add.reduceat(columns.reshape(width, -1), cols, axis=0, dtype=np.int64))
+    return np.array(sums)
+
+class PreparedTargets:
+    """
+    Target images resized and converted to the geometry of one video.
+    frame_shape: shape of the video frames the targets were prepared for
+    aliases, images: targets compared on the whole frame
+    regions: list of TargetRegion, targets compared on part of the frame
+    skipped_regions: list of (alias, error) of regions that could not be
+                     used; those targets are compared on the whole frame
+    """
+    def __init__(self, frame_shape, aliases, images, thumb_size=THUMB_SIZE, regions=None):
+        self.frame_shape = frame_shape
+        self.aliases = aliases
+        self.regions = regions or []
+        self.skipped_regions = []
+        # One contiguous (N, H, W, C) block; images are views into it
+        self.stack = np.stack(images) if images else np.empty((0,) + tuple(frame_shape), np.uint8)
+        self.images = list(self.stack)
+        self.thumb_size = thumb_size
+        self.thumbs = np.array([make_thumbnail(img, thumb_size) for img in images], dtype=np.float32)
+        self.index = None # TargetIndex, built on first use
+        self.tiles = None # (row starts, column starts, per-target tile sums), built on first use
+
+    def tile_sums(self):
+        if self.tiles is None:
+            rows, cols = tile_starts(self.frame_shape)
+            sums = np.array([tile_sums(img, rows, cols) for img in self.images])
+            self.tiles = (rows, cols, sums.reshape((len(self.images), len(rows), len(cols), -1)))
+        return self.tiles
+
+    def items(self):
+        return zip(self.aliases, self.images)
+
+    def __len__(self):
+        return len(self.aliases) + len(self.regions)
+
+class RangeBuilder:
+    """
+    Groups matching frames into ranges while they arrive, so a scan keeps
+    one open range per target instead of every matching frame.
+    Frames and ranges must be added in increasing frame order.
+    max_gap: number of missing frames bridged between two ranges
+    max_gap_time: seconds between two ranges that are bridged, or None
+    min_frames: ranges with fewer frames are dropped
+    min_duration: ranges shorter than this many seconds are dropped
+    on_range: callable receiving every kept range as soon as it is closed
+    """
+    def __init__(self, max_gap=0, max_gap_time=None, min_frames=1, min_duration=0.0, on_range=None):
+        self.max_gap = max_gap
+        self.max_gap_time = max_gap_time
+        self.min_frames = min_frames
+        self.min_duration = min_duration
+        self.on_range = on_range
+        self.ranges = [] # closed ranges
+        self._open = None
+
+    def _joins(self, current, start_frame, start_time):
+        if start_frame - current["end_frame"] - 1 <= self.max_gap:
+            return True
+        return self.max_gap_time is not None and start_time - current["end_time"] <= self.max_gap_time
+
+    def add(self, frame_idx, timestamp):
+        """
+        Adds one matching frame.
+        """
+        current = self._open
+        if current is not None and self._joins(current, frame_idx, timestamp):
+            current["end_frame"] = frame_idx
+            current["end_time"] = timestamp
+            return
+        self._close()
+        self._open = {"start_frame": frame_idx, "end_frame": frame_idx,
+                      "start_time": timestamp, "end_time": timestamp}
+
+    def add_range(self, r):
+        """
+        Adds a range of matching frames, e.g. a run of an earlier segment
+        or a cached scan. A range continuing the open one extends it.
+        """
+        current = self._open
+        if current is not None and self._joins(current, r["start_frame"], r["start_time"]):
+            current["end_frame"] = r["end_frame"]
+            current["end_time"] = r["end_time"]
+            return
+        self._close()
+        self._open = {"start_frame": r["start_frame"], "end_frame": r["end_frame"],
+                      "start_time": r["start_time"], "end_time": r["end_time"]}
+
+    def _close(self):
+        if self._open is None:
+            return
+        closed, self._open = self._open, None
+        if closed["end_frame"] - closed["start_frame"] + 1 < self.min_frames or \
+                closed["end_time"] - closed["start_time"] < self.min_duration:
+            return
+        self.ranges.append(closed)
+        if self.on_range:
+            self.on_range(closed)
+
+    def finish(self):
+        """
+        Closes the open range.
+        returns: list of all closed ranges
+        """
+        self._close()
+        return self.ranges
 
 class FrameMatcher:
-    def __init__(self, threshold=0.05):
+    supports_signatures = True # thumbnails bound the frame difference, see query_signatures
+    supports_static_gate = True # whole-frame thumbnails show every change that matters, see StaticGate
+
+    def __init__(self, threshold=0.05, prefilter=False, index=False, index_distance=6,
+                 max_gap=0, max_gap_time=None, min_frames=1, min_duration=0.0, early_exit=False):
         """
         threshold: maximum allowed difference ratio (0.0 to 1.0)
+        prefilter: reject frames on tiny thumbnails first and only confirm
+                   the remaining candidates at full resolution
+        index: look up candidate targets in a perceptual-hash index instead
+               of scanning all of them, for large target libraries. Only
+               index hits are confirmed; a target whose hash is further
+               than index_distance from the frame's is never compared, so
+               index mode can miss frames that would match
+        index_distance: maximum Hamming distance of an index hit; larger
+                        values miss fewer matches but check more targets
+        max_gap, max_gap_time, min_frames, min_duration: range grouping
+            options, see RangeBuilder
+        early_exit: bound the difference with per-tile sums first and sum
+                    exact differences tile row by tile row, stopping as soon
+                    as the threshold is out of reach; takes the place of
+                    the prefilter, whose bound it tightens
         """
         self.threshold = threshold
+        self.prefilter = prefilter
+        self.index = index
+        self.index_distance = index_distance
+        self.max_gap = max_gap
+        self.max_gap_time = max_gap_time
+        self.min_frames = min_frames
+        self.min_duration = min_duration
+        self.early_exit = early_exit
+        self._prepared = {} # frame_shape -> (source images, PreparedTargets)
+        self.stats = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"frames": 0, "prefilter_rejected": 0, "index_rejected": 0, "tile_rejected": 0}
+
+    def settings_key(self):
+        """
+        Returns a string identifying the settings that decide which frames
+        match, for keying cached results. The prefilter and early exit
+        never change results and are left out, as are the grouping options,
+        which are applied to cached runs after loading them.
+        """
+        return json.dumps({"threshold": self.threshold, "index": self.index,
+                           "index_distance": self.index_distance if self.index else None},
+                          sort_keys=True)
+
+    def clone(self):
+        """
+        Returns a matcher with the same settings but its own stats, so it can
+        match frames on another thread.
+        """
+        clone = copy.copy(self)
+        clone.reset_stats()
+        return clone
+
+    def __getstate__(self):
+        # Prepared targets are rebuilt on first use; pickling them would send
+        # every prepared target to each scan process
+        state = self.__dict__.copy()
+        state["_prepared"] = {}
+        return state
+
+    def prepare(self, targets, frame_shape, regions=None):
+        """
+        Resizes and converts the targets once for a given video geometry.
+        targets: dict of alias -> image
+        frame_shape: shape of the frames the targets will be compared against
+        regions: dict of alias -> (x, y, w, h) rectangle or mask image; those
+                 targets are only compared inside their region
+        returns: PreparedTargets, cached until the targets change
+        """
+        frame_shape = tuple(frame_shape)
+        regions = regions or {}
+        cached = self._prepared.get(frame_shape)
+        if cached is not None:
+            sources, source_regions, prepared = cached
+            if len(sources) == len(targets) and all(
+                    sources.get(alias) is img and source_regions.get(alias) is regions.get(alias)
+                    for alias, img in targets.items()):
+                return prepared
+
+        aliases, images, region_targets, skipped = [], [], [], []
+        for alias, img in targets.items():
+            fitted = self._fit_to_frame(img, frame_shape)
+            if regions.get(alias) is not None:
+                try:
+                    region_targets.append(TargetRegion(alias, fitted, regions[alias], img.shape))
+                    continue
+                except ValueError as e:
+                    skipped.append((alias, str(e)))
+            aliases.append(alias)
+            images.append(fitted)
+
+        prepared = PreparedTargets(frame_shape, aliases, images, regions=region_targets)
+        prepared.skipped_regions = skipped
+        self._prepared[frame_shape] = (dict(targets), dict(regions), prepared)
+        return prepared
+
+    def _fit_to_frame(self, img, frame_shape):
+        channels = frame_shape[2] if len(frame_shape) > 2 else 1
+        if img.ndim == 3 and img.shape[2] == 4:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR if channels == 3 else cv2.COLOR_BGRA2GRAY)
+        elif img.ndim == 3 and channels == 1:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        elif img.ndim == 2 and channels == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+        if img.shape[:2] != frame_shape[:2]:
+            img = cv2.resize(img, (frame_shape[1], frame_shape[0]))
+        return np.ascontiguousarray(img, dtype=np.uint8)
 
     def compare(self, img1, img2):
         """
@@ -16,50 +313,136 @@ class FrameMatcher:
             # Resize img2 to match img1 if shapes differ
             img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
 
-        # Simple pixel-wise difference
-        diff = cv2.absdiff(img1, img2)
-        non_zero_count = np.count_nonzero(diff)
-        total_pixels = img1.size
-        
-        # Calculate mean difference
-        # Alternatively, use mean squared error or similar
-        # For simplicity, let's use the average difference per pixel
-        mean_diff = np.mean(diff) / 255.0
-        
-        return mean_diff <= self.threshold
+        if self.early_exit:
+            return not self._exceeds(img1, img2, tile_starts(img1.shape)[0])
+        return self._score(img1, img2) <= self.threshold
+
+    def _exceeds(self, frame, target, rows, row_bounds=None):
+        """
+        Sums the exact difference one tile row at a time and stops as soon
+        as the running total can no longer stay within the threshold.
+        rows: first row of every tile row
+        row_bounds: per tile row lower bounds of the difference, which the
+                    exact sums replace one by one
+        returns: True if the mean difference exceeds the threshold
+        """
+        scale = frame.size * 255.0
+        running = float(row_bounds.sum()) if row_bounds is not None else 0.0
+        ends = list(rows[1:]) + [frame.shape[0]]
+        for b, (start, end) in enumerate(zip(rows, ends)):
+            running += cv2.norm(frame[start:end], target[start:end], cv2.NORM_L1)
+            if row_bounds is not None:
+                running -= row_bounds[b]
+            if running / scale > self.threshold:
+                return True
+        return False
+
+    def _score(self, img1, img2):
+        # Mean absolute difference per pixel, summed without a difference image
+        return cv2.norm(img1, img2, cv2.NORM_L1) / img1.size / 255.0
+
+    def compare_many(self, frame, stacked_targets):
+        """
+        Scores one frame against an (N, H, W, C) stack of prepared targets.
+        returns: array of N mean difference ratios (0.0 to 1.0), the same
+        values compare() checks against the threshold
+        """
+        # One L1 norm per target sums |a - b| without allocating a difference
+        # image; a single pass over the whole stack is slower and needs
+        # stack-sized buffers
+        sums = np.array([cv2.norm(frame, target, cv2.NORM_L1) for target in stacked_targets])
+        return sums / frame.size / 255.0
+
+    def prefilter_candidates(self, frame, prepared):
+        """
+        Returns a boolean array marking the prepared targets that may match
+        the frame. Targets outside the loosened thumbnail bound cannot pass
+        the full-resolution check, so rejecting them never changes results.
+        """
+        thumb = make_thumbnail(frame, prepared.thumb_size)
+        diffs = np.abs(prepared.thumbs - thumb).mean(axis=(1, 2))
+        return diffs <= self.threshold * 255.0 + THUMB_ROUNDING_SLACK
+
+    def query_signatures(self, store, prepared):
+        """
+        Finds the frames of a SignatureStore that may match each prepared
+        target, using the same loosened thumbnail bound as the prefilter.
+        Only these frames need decoding to confirm matches.
+        returns: dict of alias -> array of candidate frame indices
+        """
+        bound = self.threshold * 255.0 + THUMB_ROUNDING_SLACK + store.rounding_slack
+        candidates = {}
+        for alias, img in prepared.items():
+            candidates[alias] = store.candidates(make_thumbnail(img, store.thumb_size), bound)
+        return candidates
+
+    def match(self, frame, prepared):
+        """
+        Returns the aliases of all prepared targets matching the frame.
+        """
+        self.stats["frames"] += 1
+        matched = self._match_frame(frame, prepared) if prepared.aliases else []
+        for region in prepared.regions:
+            if region.score(frame) <= self.threshold:
+                matched.append(region.alias)
+        return matched
+
+    def _match_frame(self, frame, prepared):
+        if self.index:
+            return self._match_indexed(frame, prepared)
+        if self.early_exit:
+            return self._match_tiled(frame, prepared)
+        if not self.prefilter:
+            scores = self.compare_many(frame, prepared.stack)
+            return [alias for alias, score in zip(prepared.aliases, scores) if score <= self.threshold]
+
+        candidates = np.flatnonzero(self.prefilter_candidates(frame, prepared))
+        if len(candidates) == 0:
+            self.stats["prefilter_rejected"] += 1
+            return []
+        return [prepared.aliases[i] for i in candidates
+                if self._score(frame, prepared.images[i]) <= self.threshold]
+
+    def _match_tiled(self, frame, prepared):
+        # |sum(a) - sum(b)| <= sum(|a - b|) on every tile, so the tile sums of
+        # the frame, computed once for all targets, bound each difference
+        rows, cols, target_sums = prepared.tile_sums()
+        frame_sums = tile_sums(frame, rows, cols)
+        row_bounds = np.abs(target_sums - frame_sums).sum(axis=(2, 3)) # (targets, tile rows)
+        candidates = np.flatnonzero(row_bounds.sum(axis=1) / (frame.size * 255.0) <= self.threshold)
+        if len(candidates) == 0:
+            self.stats["tile_rejected"] += 1
+            return []
+        return [prepared.aliases[i] for i in candidates
+                if not self._exceeds(frame, prepared.images[i], rows, row_bounds[i])]
+
+    def _match_indexed(self, frame, prepared):
+        if prepared.index is None:
+            prepared.index = TargetIndex(prepared.images, self.index_distance)
+
+        candidates = prepared.index.candidates(frame)
+        if not candidates:
+            self.stats["index_rejected"] += 1
+            return []
+        return [prepared.aliases[i] for i in candidates if self.compare(frame, prepared.images[i])]
+
+    def range_builder(self, on_range=None):
+        """
+        Returns a RangeBuilder grouping matching frames with the grouping
+        options of this matcher, the way group_matches does.
+        on_range: callable receiving every kept range as soon as it is closed
+        """
+        return RangeBuilder(self.max_gap, self.max_gap_time, self.min_frames, self.min_duration,
+                            on_range=on_range)
 
     def group_matches(self, matches):
         """
-        Groups consecutive matching frames into ranges.
+        Groups consecutive matching frames into ranges, bridging gaps and
+        dropping short ranges as configured.
         matches: list of (frame_number, timestamp)
         returns: list of dicts with start/end frame/time
         """
-        if not matches:
-            return []
-
-        ranges = []
-        start_frame, start_time = matches[0]
-        prev_frame, prev_time = matches[0]
-
-        for i in range(1, len(matches)):
-            curr_frame, curr_time = matches[i]
-            if curr_frame == prev_frame + 1:
-                prev_frame, prev_time = curr_frame, curr_time
-            else:
-                ranges.append({
-                    "start_frame": start_frame,
-                    "end_frame": prev_frame,
-                    "start_time": start_time,
-                    "end_time": prev_time
-                })
-                start_frame, start_time = curr_frame, curr_time
-                prev_frame, prev_time = curr_frame, curr_time
-
-        ranges.append({
-            "start_frame": start_frame,
-            "end_frame": prev_frame,
-            "start_time": start_time,
-            "end_time": prev_time
-        })
-
-        return ranges
+        builder = self.range_builder()
+        for frame_idx, timestamp in matches:
+            builder.add(frame_idx, timestamp)
+        return builder.finish()
@@ -0,0 +1,94 @@
+import os
+import threading
+import cv2
+
+def fourcc_name(code):
+    """
+    returns: the four characters of a CAP_PROP_FOURCC value, e.g. "h264"
+    """
+    code = int(code)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+def read_video_info(cap, video_path):
+    """
+    Reads the metadata record of a video from an opened cv2.VideoCapture.
+    returns: dict with path, width, height, fps, total_frames, duration and codec
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return {
+        "path": video_path,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": fps,
+        "total_frames": total_frames,
+        "duration": total_frames / fps if fps else 0.0,
+        "codec": fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+    }
+
+def probe_video(video_path):
+    """
+    Opens a video just to read its metadata record.
+    raises: ValueError if the video cannot be opened
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}")
+    info = read_video_info(cap, video_path)
+    cap.release()
+    return info
+
+class ProbeCache:
+    """
+    Metadata records of videos by path, so each file is opened for its
+    properties at most once. Records are dropped when the file's size or
+    modification time changes. Safe to share between threads.
+    """
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _key(self, video_path):
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        return (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+
+    def put(self, video_path, info):
+        """
+        Stores a record that was read while the video was open anyway.
+        """
+        key = self._key(video_path)
+        if key is not None:
+            with self._lock:
+                self._records[key[0]] = (key, info)
+
+    def lookup(self, video_path):
+        """
+        returns: the cached record, or None without probing the video
+        """
+        key = self._key(video_path)
+        if key is None:
+            return None
+        with self._lock:
+            cached = self._records.get(key[0])
+        return cached[1] if cached is not None and cached[0] == key else None
+
+    def get(self, video_path):
+        """
+        returns: the cached record, probing the video on a miss
+        raises: ValueError if the video cannot be opened
+        """
+        info = self.lookup(video_path)
+        if info is not None:
+            return info
+        info = probe_video(video_path)
+        self.put(video_path, info)
+        return info
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+probe_cache = ProbeCache() # shared by the scanner, the marker generator and the GUI
@@ -0,0 +1,862 @@
+import cv2
+import numpy as np
+import os
+import json
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.matcher import RangeBuilder, make_thumbnail
+from src.sources import open_source
+from src.probe import probe_cache
+from src.cache import video_fingerprint, image_hash
+from src.signatures import SignatureStore, signature_dir
+
+def load_targets(target_images, log=None):
+    """
+    Loads target images from disk.
+    target_images: dict of path -> alias
+    returns: dict of alias -> image
+    """
+    target_data = {}
+    for path, alias in target_images.items():
+        img = cv2.imread(path)
+        if img is not None:
+            target_data[alias] = img
+        elif log:
+            log(f"Error: Could not load target image {path}")
+    return target_data
+
+def parse_region(text):
+    """
+    Parses a target region: "x,y,w,h" in pixels of the target image, or
+    the path of a mask image. Empty text means the whole frame.
+    returns: (x, y, w, h), a mask path, or None
+    """
+    text = text.strip()
+    if not text:
+        return None
+    parts = text.split(",")
+    if len(parts) == 4:
+        try:
+            return tuple(int(p) for p in parts)
+        except ValueError:
+            pass
+    return text
+
+def region_error(region, image_shape):
+    """
+    Checks a region against the shape of its target image.
+    region: (x, y, w, h) rectangle or mask image
+    returns: why the region cannot be used, or None if it is valid
+    """
+    if isinstance(region, np.ndarray):
+        return None if np.any(region) else "the mask is empty"
+    x, y, w, h = region
+    if w <= 0 or h <= 0:
+        return "the rectangle is empty"
+    height, width = image_shape[:2]
+    if x < 0 or y < 0 or x + w > width or y + h > height:
+        return f"the rectangle does not fit into the {width}x{height} image"
+    return None
+
+def load_regions(regions, target_images, log=None, target_data=None):
+    """
+    Loads the regions of targets. Invalid regions are logged and skipped,
+    so their targets are compared on the whole frame.
+    regions: dict of path -> (x, y, w, h) or mask image path
+    target_images: dict of path -> alias
+    target_data: dict of alias -> image as returned by load_targets; target
+                 images are read from disk if None
+    returns: dict of alias -> (x, y, w, h) or mask image
+    """
+    log = log or (lambda message: None)
+    loaded = {}
+    for path, region in regions.items():
+        if path not in target_images or region is None:
+            continue
+        alias = target_images[path]
+        if isinstance(region, str):
+            mask = cv2.imread(region, cv2.IMREAD_GRAYSCALE)
+            if mask is None:
+                log(f"Error: Could not load region mask {region}")
+                continue
+            region = mask
+        image = target_data.get(alias) if target_data is not None else cv2.imread(path)
+        if image is None:
+            continue # reported by load_targets
+        error = region_error(region, image.shape)
+        if error:
+            log(f"Error: Region of target '{alias}' ignored: {error}")
+            continue
+        loaded[alias] = region
+    return loaded
+
+def throttle(callback, interval):
+    """
+    Wraps a progress callback so it runs at most once per interval seconds.
+    """
+    last = [None]
+
+    def throttled(*args):
+        now = time.monotonic()
+        if last[0] is None or now - last[0] >= interval:
+            last[0] = now
+            callback(*args)
+    return throttled
+
+def merge_results(aliases, scanned):
+    """
+    Merges per-video scan results into one dict of alias -> list of ranges.
+    scanned: per-video results as returned by VideoScanner.scan, or None
+    """
+    results = {alias: [] for alias in aliases}
+    for video_results in scanned:
+        if video_results is None:
+            continue
+        for alias, ranges in video_results.items():
+            results[alias].extend(ranges)
+    return results
+
+class StaticGate:
+    """
+    Compares frames to the last frame that was actually matched by their
+    thumbnails, so the verdicts of that frame can be reused while the
+    picture stays the same. Comparing to the last matched frame rather than
+    the previous one keeps slow fades from drifting through unnoticed.
+    tolerance: maximum mean thumbnail difference in levels (0 to 255)
+    """
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.anchor = None
+        self.reused = 0
+
+    def unchanged(self, frame):
+        thumb = make_thumbnail(frame)
+        if self.anchor is not None and self.anchor.shape == thumb.shape and \
+                np.abs(thumb - self.anchor).mean() <= self.tolerance:
+            self.reused += 1
+            return True
+        self.anchor = thumb
+        return False
+
+class VideoScanner:
+    """
+    Scans videos for target images without depending on Qt.
+    log: callable receiving log messages
+    should_continue: callable returning False once scanning must stop;
+                     it may block while scanning is paused
+    stride: compare only every stride-th frame and skip the others with
+            cap.grab(); a sampled hit rewinds to the previous sample and
+            scans frame by frame until no target matches. Ranges are exact
+            as long as every occurrence lasts at least stride frames.
+    pipeline: size of a ring of reused frame buffers shared by a decode
+              stage and match_threads match stages running concurrently;
+              0 decodes and matches in turn on one thread. Not combined
+              with stride, which needs to seek back after a hit.
+    source: frame source kind, "opencv" or "ffmpeg" (see src.sources)
+    source_options: keyword arguments of the frame source, e.g. scale/gray
+    cache: ResultCache for per-target match lists; targets already cached
+           for a video are not scanned again
+    signatures: directory of per-video SignatureStores (see src.signatures);
+                indexed videos are only decoded at candidate frames
+    on_range: callable(alias, range) receiving every range of scan() as
+              soon as it is closed, while the video is still being scanned
+    progress_interval: minimum number of seconds between progress reports
+    regions: dict of alias -> (x, y, w, h) or mask image (see load_regions);
+             those targets are only compared inside their region
+    static_tolerance: reuse the verdicts of the last matched frame for
+                      frames whose thumbnail differs from it by at most this
+                      many levels on average (see StaticGate); None matches
+                      every frame. Not used for region or template targets.
+    """
+    def __init__(self, matcher, target_data, log=None, should_continue=None, stride=1,
+                 pipeline=0, match_threads=1, source="opencv", source_options=None, cache=None,
+                 signatures=None, on_range=None, progress_interval=0.1, regions=None,
+                 static_tolerance=None):
+        self.matcher = matcher
+        self.target_data = target_data # alias -> image
+        self.log = log or (lambda message: None)
+        self.should_continue = should_continue or (lambda: True)
+        self.stride = max(1, stride)
+        self.pipeline = max(pipeline, match_threads + 1) if pipeline else 0
+        self.match_threads = max(1, match_threads)
+        self.source = source
+        self.source_options = source_options or {}
+        self.cache = cache
+        self.signatures = signatures
+        self.on_range = on_range or (lambda alias, r: None)
+        self.progress_interval = progress_interval
+        self.regions = regions or {}
+        self.static_tolerance = static_tolerance
+        self.interrupted = False # whether the last scan_matches was stopped early
+
+    def scan(self, video_path, progress=None):
+        """
+        Scans one video and groups the matches of every target into ranges.
+        progress: callable(frame_idx, total_frames), called at most every
+                  progress_interval seconds and once at the end
+        returns: dict of alias -> list of ranges, or None if the video
+        could not be opened
+        """
+        key, cached = self.lookup_cache(video_path)
+        missing = [alias for alias in self.target_data if alias not in cached]
+        builders = self.range_builders(video_path, self.target_data)
+        for alias, runs in cached.items():
+            for run in runs:
+                builders[alias].add_range(run)
+        if not missing:
+            return self.finish(video_path, builders)
+
+        # Runs of consecutive frames are grouped into ranges as they close
+        def on_run(alias, run):
+            builders[alias].add_range(run)
+
+        store = self.find_signatures(video_path)
+        if store is not None:
+            runs_per_target = self.scan_signatures(video_path, store, missing, progress=progress, on_run=on_run)
+        else:
+            runs_per_target = self.scan_matches(video_path, progress=progress, aliases=missing, on_run=on_run)
+        if runs_per_target is None:
+            return None
+        if not self.interrupted:
+            self.store_cache(key, runs_per_target)
+        return self.finish(video_path, builders)
+
+    def settings_key(self):
+        """
+        Identifies the matcher and scanner settings that decide which frames match.
+        """
+        return json.dumps({"matcher": self.matcher.settings_key(), "stride": self.stride,
+                           "source": self.source, "source_options": self.source_options,
+                           "static_tolerance": self.static_tolerance},
+                          sort_keys=True)
+
+    def lookup_cache(self, video_path):
+        """
+        returns: (cache key, dict of alias -> cached runs); the key is
+        None and nothing is cached when caching is off
+        """
+        if self.cache is None or not os.path.isfile(video_path):
+            return None, {}
+
+        key = (video_fingerprint(video_path),
+               {alias: image_hash(img, self.regions.get(alias)) for alias, img in self.target_data.items()},
+               self.settings_key())
+        cached = {}
+        for alias, target in key[1].items():
+            runs = self.cache.get(key[0], target, key[2])
+            if runs is not None:
+                cached[alias] = runs
+
+        video_name = os.path.basename(video_path)
+        if cached and len(cached) == len(self.target_data):
+            self.log(f"Using cached results for {video_name}")
+        elif cached:
+            self.log(f"Using cached results for {len(cached)} targets in {video_name}, "
+                     f"scanning {len(self.target_data) - len(cached)} new targets")
+        return key, cached
+
+    def store_cache(self, key, runs_per_target):
+        if key is None:
+            return
+        video, targets, settings = key
+        for alias, runs in runs_per_target.items():
+            self.cache.put(video, targets[alias], settings, runs)
+
+    def find_signatures(self, video_path):
+        """
+        returns: the SignatureStore of a video if one was built with the
+        frame source this scanner uses, else None. Signatures cover whole
+        frames, so they are not used for targets with regions.
+        """
+        if not self.signatures or not self.matcher.supports_signatures or self.matcher.index or self.regions \
+                or not os.path.isfile(video_path):
+            return None
+        directory = signature_dir(self.signatures, video_path)
+        if not SignatureStore.exists(directory):
+            return None
+        store = SignatureStore(directory)
+        if (store.meta["source"], store.meta["source_options"]) != \
+                (self.source, json.loads(json.dumps(self.source_options))):
+            return None
+        return store
+
+    def scan_signatures(self, video_path, store, aliases, progress=None, on_run=None):
+        """
+        Matches targets against a video's stored frame signatures and only
+        decodes the candidate frames to confirm them at full resolution.
+        returns: dict of alias -> list of runs, as scan_matches
+        """
+        video_name = os.path.basename(video_path)
+        target_data = {alias: self.target_data[alias] for alias in aliases}
+        prepared = self.matcher.prepare(target_data, store.frame_shape)
+        candidates = self.matcher.query_signatures(store, prepared)
+
+        frames = {} # frame_idx -> positions of the candidate targets
+        for i, alias in enumerate(prepared.aliases):
+            for f in candidates[alias]:
+                frames.setdefault(int(f), []).append(i)
+        self.log(f"Signatures left {len(frames)} of {store.count} frames of {video_name} to confirm")
+
+        builders = self.run_builders(target_data, on_run)
+        self.interrupted = False
+        if not frames:
+            return self.finish_runs(builders)
+
+        cap = open_source(video_path, self.source, **self.source_options)
+        if not cap.is_opened():
+            self.log(f"Error: Could not open video {video_path}")
+            return None
+        probe_cache.put(video_path, cap.info())
+
+        report = throttle(progress, self.progress_interval) if progress else None
+        position = None # index of the frame the next read returns
+        for n, f in enumerate(sorted(frames)):
+            if not self.should_continue():
+                self.interrupted = True
+                break
+            # Walk short gaps forward, seek across long ones
+            if position is None or not 0 <= f - position <= 16:
+                cap.seek(f)
+                position = f
+            while position < f and cap.grab():
+                position += 1
+            frame = cap.read()
+            if frame is None:
+                break
+            position += 1
+
+            for i in frames[f]:
+                if self.matcher.compare(frame, prepared.images[i]):
+                    builders[prepared.aliases[i]].add(f, float(store.timestamps[f]))
+            if report:
+                report(n + 1, len(frames))
+        cap.release()
+        if progress:
+            progress(len(frames), len(frames))
+        return self.finish_runs(builders)
+
+    def prepare(self, target_data, frame_shape):
+        """
+        Prepares the targets for a video geometry, logging regions the
+        matcher could not use.
+        """
+        prepared = self.matcher.prepare(target_data, frame_shape, self.regions)
+        for alias, error in prepared.skipped_regions:
+            self.log(f"Error: Region of target '{alias}' ignored: {error}")
+        return prepared
+
+    def static_gate(self, target_data):
+        """
+        returns: a StaticGate for scanning target_data, or None. Small regions
+        and templates can appear without moving the whole-frame thumbnail,
+        so their frames are always matched.
+        """
+        if self.static_tolerance is None:
+            return None
+        if not self.matcher.supports_static_gate or any(alias in self.regions for alias in target_data):
+            self.log("Matching every frame: region and template targets are too small for static frame reuse")
+            return None
+        return StaticGate(self.static_tolerance)
+
+    def run_builders(self, target_data, on_run=None):
+        """
+        returns: dict of alias -> RangeBuilder collecting the runs of
+        consecutive matching frames of one scan
+        """
+        def builder(alias):
+            if on_run is None:
+                return RangeBuilder()
+            return RangeBuilder(on_range=lambda run: on_run(alias, run))
+        return {alias: builder(alias) for alias in target_data}
+
+    def finish_runs(self, builders):
+        return {alias: builder.finish() for alias, builder in builders.items()}
+
+    def scan_matches(self, video_path, start_frame=0, end_frame=None, progress=None, aliases=None,
+                     on_run=None):
+        """
+        Scans the frames [start_frame, end_frame) of one video.
+        end_frame: None scans to the end of the video
+        aliases: only match these targets; None matches all of them
+        on_run: callable(alias, run) receiving every run as soon as it is closed
+        returns: dict of alias -> list of runs of consecutive matching
+        frames (dicts with start/end frame/time), or None if the video
+        could not be opened
+        """
+        target_data = self.target_data
+        if aliases is not None:
+            target_data = {alias: self.target_data[alias] for alias in aliases}
+        self.interrupted = False
+
+        video_name = os.path.basename(video_path)
+        if start_frame or end_frame is not None:
+            end_label = "end" if end_frame is None else end_frame - 1
+            self.log(f"Processing video: {video_name} (frames {start_frame}-{end_label})")
+        else:
+            self.log(f"Processing video: {video_name}")
+        cap = open_source(video_path, self.source, **self.source_options)
+        if not cap.is_opened():
+            self.log(f"Error: Could not open video {video_path}")
+            return None
+        probe_cache.put(video_path, cap.info())
+
+        total_frames = cap.frame_count()
+        if start_frame:
+            cap.seek(start_frame)
+        builders = self.run_builders(target_data, on_run)
+
+        report = throttle(progress, self.progress_interval) if progress else None
+        gate = self.static_gate(target_data)
+        self.matcher.reset_stats()
+        started = time.perf_counter()
+        if self.pipeline and self.stride == 1:
+            frame_idx = self._scan_pipelined(cap, target_data, start_frame, end_frame, total_frames,
+                                             builders, report, gate)
+        else:
+            frame_idx = self._scan_sequential(cap, target_data, start_frame, end_frame, total_frames,
+                                              builders, report, gate)
+        cap.release()
+        if progress:
+            progress(frame_idx, total_frames)
+        runs_per_target = self.finish_runs(builders)
+
+        elapsed = time.perf_counter() - started
+        scanned = frame_idx - start_frame
+        self.log(f"Scanned {scanned} frames of {video_name} in {elapsed:.1f}s "
+                 f"({scanned / max(elapsed, 1e-6):.0f} fps, {self.source} source)")
+
+        stats = self.matcher.stats
+        if gate is not None:
+            self.log(f"Reused verdicts for {gate.reused} of {gate.reused + stats['frames']} frames "
+                     f"in {video_name} with an unchanged picture")
+        if self.stride > 1:
+            self.log(f"Compared {stats['frames']} of {frame_idx - start_frame} frames "
+                     f"in {video_name} (stride {self.stride})")
+        if self.matcher.index:
+            self.log(f"Target index rejected {stats['index_rejected']} of {stats['frames']} frames "
+                     f"in {video_name}")
+        elif self.matcher.early_exit:
+            self.log(f"Tile bounds rejected {stats['tile_rejected']} of {stats['frames']} frames "
+                     f"in {video_name}")
+        elif self.matcher.prefilter:
+            self.log(f"Prefilter rejected {stats['prefilter_rejected']} of {stats['frames']} frames "
+                     f"in {video_name}")
+        if "coarse_rejected" in stats:
+            self.log(f"Coarse template search rejected {stats['coarse_rejected']} of {stats['frames']} frames "
+                     f"in {video_name}")
+        return runs_per_target
+
+    def _scan_sequential(self, cap, target_data, start_frame, end_frame, total_frames,
+                         builders, progress, gate=None):
+        # Sampling state: frames between samples are only grabbed, and the
+        # last frame before the limit is always sampled so ranges touching
+        # the end of a segment are not cut short
+        limit = end_frame if end_frame is not None else total_frames
+        dense = self.stride == 1
+        next_sample = start_frame
+        last_miss = start_frame - 1 # last compared frame without any match
+        hit_frame = start_frame # dense scanning continues at least up to here
+
+        prepared = None
+        verdicts = [] # of the last frame that was matched
+        frame_idx = start_frame
+        while self.should_continue():
+            if end_frame is not None and frame_idx >= end_frame:
+                break
+
+            if not dense and frame_idx != next_sample:
+                if not cap.grab():
+                    break
+                frame_idx += 1
+                if progress:
+                    progress(frame_idx, total_frames)
+                continue
+
+            frame = cap.read()
+            if frame is None:
+                break
+
+            timestamp = cap.timestamp()
+
+            # Targets are resized once per video geometry, not per frame
+            if prepared is None or prepared.frame_shape != frame.shape:
+                prepared = self.prepare(target_data, frame.shape)
+
+            if gate is not None and gate.unchanged(frame):
+                matched = verdicts
+            else:
+                matched = verdicts = self.matcher.match(frame, prepared)
+            if not dense and matched:
+                # Step back to the frame after the last miss and find the
+                # exact range boundaries frame by frame
+                dense = True
+                hit_frame = frame_idx
+                if last_miss + 1 < frame_idx:
+                    frame_idx = last_miss + 1
+                    cap.seek(frame_idx)
+                    continue
+            elif self.stride > 1 and not matched and frame_idx >= hit_frame:
+                dense = False
+                last_miss = frame_idx
+                next_sample = frame_idx + self.stride
+                if frame_idx < limit - 1:
+                    next_sample = min(next_sample, limit - 1)
+
+            for alias in matched:
+                builders[alias].add(frame_idx, timestamp)
+
+            frame_idx += 1
+            if progress:
+                progress(frame_idx, total_frames)
+        else:
+            self.interrupted = True
+        return frame_idx
+
+    def _scan_pipelined(self, cap, target_data, start_frame, end_frame, total_frames,
+                        builders, progress, gate=None):
+        """
+        Decodes on the calling thread into a ring of frame buffers, each
+        allocated once and then reused, while match threads consume it.
+        A slot only returns to the decoder once its frame was matched, so a
+        full ring blocks decoding and memory stays flat. Pausing or stopping halts the decoder through
+        should_continue(); the match threads drain what is queued.
+        Verdicts are handed to the builders in frame order; frames matched
+        ahead of an earlier one wait, at most one per ring slot. Frames the
+        gate finds unchanged skip the match threads and take the verdicts
+        of the last matched frame once it is their turn.
+        """
+        free_slots = queue.Queue()
+        for slot in range(self.pipeline):
+            free_slots.put(slot)
+        decoded = queue.Queue()
+        buffers = [None] * self.pipeline
+        waiting = {} # frame_idx -> (timestamp, matched aliases)
+        next_frame = [start_frame] # next frame to hand to the builders
+        last_verdicts = [[]]
+        order = threading.Lock()
+        errors = []
+
+        def deliver(frame_idx, timestamp, matched):
+            with order:
+                waiting[frame_idx] = (timestamp, matched)
+                while next_frame[0] in waiting:
+                    ts, aliases = waiting.pop(next_frame[0])
+                    if aliases is None: # unchanged frame
+                        aliases = last_verdicts[0]
+                    else:
+                        last_verdicts[0] = aliases
+                    for alias in aliases:
+                        builders[alias].add(next_frame[0], ts)
+                    next_frame[0] += 1
+
+        matchers = [self.matcher] + [self.matcher.clone() for _ in range(self.match_threads - 1)]
+
+        def match_stage(matcher):
+            try:
+                while True:
+                    item = decoded.get()
+                    if item is None:
+                        return
+                    slot, frame_idx, timestamp, prepared = item
+                    deliver(frame_idx, timestamp, matcher.match(buffers[slot], prepared))
+                    free_slots.put(slot)
+            except Exception as e:
+                errors.append(e)
+                free_slots.put(None) # wake the decoder
+
+        threads = [threading.Thread(target=match_stage, args=(m,), daemon=True) for m in matchers]
+        for t in threads:
+            t.start()
+
+        prepared = None
+        frame_idx = start_frame
+        try:
+            while not errors and self.should_continue():
+                if end_frame is not None and frame_idx >= end_frame:
+                    break
+
+                slot = free_slots.get()
+                if slot is None:
+                    break
+                frame = cap.read(buffers[slot])
+                if frame is None:
+                    break
+                buffers[slot] = frame # read() reallocates if the geometry changed
+
+                timestamp = cap.timestamp()
+                if gate is not None and gate.unchanged(frame):
+                    deliver(frame_idx, timestamp, None)
+                    free_slots.put(slot)
+                else:
+                    if prepared is None or prepared.frame_shape != frame.shape:
+                        prepared = self.prepare(target_data, frame.shape)
+                    decoded.put((slot, frame_idx, timestamp, prepared))
+
+                frame_idx += 1
+                if progress:
+                    progress(frame_idx, total_frames)
+            else:
+                self.interrupted = True
+        finally:
+            for _ in threads:
+                decoded.put(None)
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
+
+        for clone in matchers[1:]:
+            for key, value in clone.stats.items():
+                self.matcher.stats[key] += value
+        return frame_idx
+
+    def range_builders(self, video_path, aliases):
+        """
+        returns: dict of alias -> RangeBuilder of the matcher, grouping the
+        runs of one video into result ranges tagged with the video and its
+        metadata record and passing each to on_range as soon as it is
+        closed. Every range is logged once, instead of every matching frame.
+        """
+        video_name = os.path.basename(video_path)
+        info = []
+
+        def video_info():
+            # Recorded by the scan when it opened the video; probed only for
+            # results that came from the cache
+            if not info:
+                try:
+                    info.append(probe_cache.get(video_path))
+                except ValueError:
+                    info.append(None)
+            return info[0]
+
+        def builder(alias):
+            def close(r):
+                r['video'] = video_name
+                r['video_path'] = video_path
+                r['video_info'] = video_info()
+                self.log(f"Match found for '{alias}' from {r['start_time']:.2f}s to {r['end_time']:.2f}s")
+                self.on_range(alias, r)
+            return self.matcher.range_builder(on_range=close)
+        return {alias: builder(alias) for alias in aliases}
+
+    def finish(self, video_path, builders):
+        video_name = os.path.basename(video_path)
+        results = {}
+        for alias, builder in builders.items():
+            results[alias] = builder.finish()
+            self.log(f"Found {len(results[alias])} occurrences for '{alias}' in {video_name}")
+        return results
+
+    def group(self, video_path, runs_per_target):
+        """
+        Groups the runs of every target into ranges tagged with the video.
+        Runs of consecutive segments can be concatenated in frame order
+        before grouping; ranges crossing a segment boundary then come out
+        as one range, exactly as in a serial scan.
+        """
+        builders = self.range_builders(video_path, runs_per_target)
+        for alias, runs in runs_per_target.items():
+            for run in runs:
+                builders[alias].add_range(run)
+        return self.finish(video_path, builders)
+
+def split_segments(total_frames, segments, min_frames=1000):
+    """
+    Splits [0, total_frames) into up to `segments` contiguous frame ranges of
+    at least min_frames each. The last range is open-ended (end None) so
+    frames beyond an inaccurate frame count are still scanned.
+    returns: list of (start_frame, end_frame)
+    """
+    segments = max(1, min(segments, total_frames // max(min_frames, 1)))
+    bounds = [round(i * total_frames / segments) for i in range(segments)]
+    return [(start, end) for start, end in zip(bounds, bounds[1:] + [None])]
+
+# State of a scan process, set by _init_process
+_events = None
+_resume = None
+_stop = None
+
+def _init_process(events, resume, stop):
+    global _events, _resume, _stop
+    _events, _resume, _stop = events, resume, stop
+
+def _should_continue():
+    _resume.wait()
+    return not _stop.is_set()
+
+def _scan_job(job_idx, matcher, target_images, scan_options, video_path, start_frame, end_frame, aliases):
+    if _stop.is_set():
+        return None
+
+    def report(frame_idx, total_frames):
+        end = total_frames if end_frame is None else end_frame
+        _events.put(("progress", job_idx, (frame_idx - start_frame) / max(end - start_frame, 1)))
+
+    scanner = VideoScanner(matcher, load_targets(target_images),
+                           log=lambda message: _events.put(("log", message)),
+                           should_continue=_should_continue, **scan_options)
+    store = scanner.find_signatures(video_path) if start_frame == 0 and end_frame is None else None
+    if store is not None:
+        runs = scanner.scan_signatures(video_path, store, aliases, progress=report)
+    else:
+        runs = scanner.scan_matches(video_path, start_frame, end_frame, progress=report, aliases=aliases)
+    # The metadata read while the video was open, so the parent need not open it again
+    return runs, scanner.interrupted, probe_cache.lookup(video_path)
+
+class ParallelScanner:
+    """
+    Scans several videos at once in a pool of worker processes.
+    Every job opens its own capture; log messages and progress are sent
+    back over a queue and delivered to the callbacks in this process.
+    segments: number of frame ranges long videos are split into, so a
+              single video can also use several processes
+    min_segment_frames: videos are only split into ranges this long or longer
+    scan_options: keyword arguments for the VideoScanner of every job
+    log: callable receiving log messages
+    progress: callable receiving the overall progress in percent
+    on_range: callable(alias, range) receiving the ranges of every video
+              once its jobs are done
+    heartbeat: callable called about every 0.1 seconds while jobs run,
+               e.g. to flush batched log messages
+    """
+    def __init__(self, matcher, target_images, processes, segments=1, min_segment_frames=1000,
+                 scan_options=None, log=None, progress=None, on_range=None, heartbeat=None):
+        self.matcher = matcher
+        self.target_images = target_images # path -> alias
+        self.processes = processes
+        self.scan_options = scan_options or {}
+        self.segments = segments
+        self.min_segment_frames = min_segment_frames
+        self.log = log or (lambda message: None)
+        self.progress = progress or (lambda percent: None)
+        self.on_range = on_range
+        self.heartbeat = heartbeat or (lambda: None)
+
+        # spawn keeps Qt and other threads of the parent out of the children
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._resume = self._context.Event()
+        self._resume.set()
+        self._stop = self._context.Event()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def stop(self):
+        self._stop.set()
+        self._resume.set()
+
+    def _plan_jobs(self, video_paths, indices=None):
+        """
+        indices: positions of the videos to scan; None scans all of them
+        returns: list of (video index, start frame, end frame, weight)
+        """
+        indices = range(len(video_paths)) if indices is None else indices
+        jobs = []
+        for v_idx in indices:
+            path = video_paths[v_idx]
+            ranges = [(0, None)]
+            if self.segments > 1:
+                try:
+                    ranges = split_segments(probe_cache.get(path)["total_frames"], self.segments,
+                                            self.min_segment_frames)
+                except ValueError:
+                    pass # reported by the scan job
+            for start, end in ranges:
+                jobs.append((v_idx, start, end, 1.0 / (len(ranges) * len(indices))))
+        return jobs
+
+    def scan(self, video_paths):
+        """
+        returns: list with the per-target ranges of every video, in the
+        order of video_paths, or None for videos that were not scanned
+        """
+        # Cache lookups, stores and grouping happen in this process; the
+        # jobs only scan the targets a video has no cached matches for
+        local = VideoScanner(self.matcher, load_targets(self.target_images), log=self.log,
+                             on_range=self.on_range, **self.scan_options)
+        job_options = {key: value for key, value in self.scan_options.items() if key != "cache"}
+        lookups = [local.lookup_cache(path) for path in video_paths]
+        missing = [[alias for alias in local.target_data if alias not in cached] for _, cached in lookups]
+        jobs = self._plan_jobs(video_paths, [i for i, aliases in enumerate(missing) if aliases])
+
+        fractions = [0.0] * len(jobs)
+        last_percent = [-1]
+
+        def handle(event):
+            if event[0] == "log":
+                self.log(event[1])
+                return
+            fractions[event[1]] = min(event[2], 1.0)
+            percent = int(sum(f * job[3] for f, job in zip(fractions, jobs)) * 100)
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.progress(percent)
+
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=self._context,
+                                 initializer=_init_process,
+                                 initargs=(self._events, self._resume, self._stop)) as pool:
+            futures = [pool.submit(_scan_job, i, self.matcher, self.target_images, job_options,
+                                   video_paths[v_idx], start, end, missing[v_idx])
+                       for i, (v_idx, start, end, _) in enumerate(jobs)]
+            while not all(f.done() for f in futures):
+                self.heartbeat()
+                try:
+                    handle(self._events.get(timeout=0.1))
+                except queue.Empty:
+                    continue
+
+        # Deliver whatever the last processes sent before exiting
+        while True:
+            try:
+                handle(self._events.get(timeout=0.05))
+            except queue.Empty:
+                break
+        if not self._stop.is_set() and last_percent[0] < 100:
+            self.progress(100)
+
+        # Stitch the segments of every video back together in frame order
+        per_video = [None] * len(video_paths)
+        complete = [True] * len(video_paths)
+        for (v_idx, start, end, _), future in zip(jobs, futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                self.log(f"Error scanning video {video_paths[v_idx]}: {str(e)}")
+                outcome = None
+            if outcome is None or outcome[0] is None:
+                complete[v_idx] = False
+                continue
+            runs, interrupted, info = outcome
+            if info is not None:
+                probe_cache.put(video_paths[v_idx], info)
+            complete[v_idx] = complete[v_idx] and not interrupted
+            if per_video[v_idx] is None:
+                per_video[v_idx] = {alias: RangeBuilder() for alias in runs}
+            for alias, segment_runs in runs.items():
+                for run in segment_runs:
+                    per_video[v_idx][alias].add_range(run)
+
+        scanned = []
+        for v_idx, path in enumerate(video_paths):
+            key, cached = lookups[v_idx]
+            if not missing[v_idx]:
+                runs = {}
+            elif per_video[v_idx] is None:
+                scanned.append(None)
+                continue
+            else:
+                runs = local.finish_runs(per_video[v_idx])
+                if complete[v_idx]:
+                    local.store_cache(key, runs)
+            runs.update(cached)
+            scanned.append(local.group(path, {alias: runs[alias] for alias in local.target_data}))
+        return scanned
@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+from src.matcher import THUMB_SIZE, make_thumbnail
+from src.sources import open_source
+from src.cache import video_fingerprint
+
+# Thumbnails are stored as uint8, which moves each stored value by up to
+# half a level on top of the rounding make_thumbnail already allows for.
+STORE_ROUNDING_SLACK = 0.5
+
+def signature_dir(root, video_path):
+    """
+    returns: directory holding the signatures of a video below root
+    """
+    return os.path.join(root, video_fingerprint(video_path))
+
+class SignatureStore:
+    """
+    Memory-mapped per-frame thumbnails and timestamps of one video.
+    Lets new targets be matched against a video without decoding it: only
+    frames whose thumbnail is close enough have to be decoded and confirmed.
+    """
+    rounding_slack = STORE_ROUNDING_SLACK
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.count = self.meta["count"]
+        self.frame_shape = tuple(self.meta["frame_shape"])
+        self.thumb_size = tuple(self.meta["thumb_size"])
+        thumb_shape = (self.count, self.thumb_size[1], self.thumb_size[0])
+        if self.count == 0: # empty files cannot be mapped
+            self.thumbs = np.empty(thumb_shape, np.uint8)
+            self.timestamps = np.empty(0, np.float64)
+            return
+        self.thumbs = np.memmap(os.path.join(directory, "thumbs.u8"), dtype=np.uint8, mode="r",
+                                shape=thumb_shape)
+        self.timestamps = np.memmap(os.path.join(directory, "timestamps.f8"), dtype=np.float64, mode="r",
+                                    shape=(self.count,))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.isfile(os.path.join(directory, "meta.json"))
+
+    def candidates(self, thumb, bound, chunk=65536):
+        """
+        returns: indices of the frames whose mean thumbnail difference to
+        thumb is within bound
+        """
+        found = []
+        for start in range(0, self.count, chunk):
+            block = self.thumbs[start:start + chunk].astype(np.float32)
+            diffs = np.abs(block - thumb).mean(axis=(1, 2))
+            found.append(np.flatnonzero(diffs <= bound) + start)
+        return np.concatenate(found) if found else np.empty(0, np.int64)
+
+def build_signatures(video_path, directory, source="opencv", source_options=None,
+                     log=None, should_continue=None, progress=None):
+    """
+    Decodes a video once and writes the thumbnail and timestamp of every frame.
+    returns: SignatureStore, or None if the video could not be opened or
+    indexing was stopped
+    """
+    log = log or (lambda message: None)
+    should_continue = should_continue or (lambda: True)
+    source_options = source_options or {}
+
+    cap = open_source(video_path, source, **source_options)
+    if not cap.is_opened():
+        log(f"Error: Could not open video {video_path}")
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path) # an incomplete rebuild must not look valid
+
+    total_frames = cap.frame_count()
+    timestamps = []
+    frame_shape = None
+    frame = None
+    complete = True
+    with open(os.path.join(directory, "thumbs.u8"), "wb") as thumbs:
+        while True:
+            if not should_continue():
+                complete = False
+                break
+            frame = cap.read(frame)
+            if frame is None:
+                break
+            frame_shape = frame.shape
+            thumb = np.round(make_thumbnail(frame, THUMB_SIZE)).astype(np.uint8)
+            thumbs.write(thumb.tobytes())
+            timestamps.append(cap.timestamp())
+            if progress and len(timestamps) % 10 == 0:
+                progress(len(timestamps), total_frames)
+    cap.release()
+
+    if not complete:
+        log(f"Indexing of {os.path.basename(video_path)} stopped.")
+        return None
+
+    np.array(timestamps, dtype=np.float64).tofile(os.path.join(directory, "timestamps.f8"))
+    meta = {"count": len(timestamps), "frame_shape": list(frame_shape or ()), "thumb_size": list(THUMB_SIZE),
+            "source": source, "source_options": source_options}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    log(f"Indexed {len(timestamps)} frames of {os.path.basename(video_path)}")
+    return SignatureStore(directory)
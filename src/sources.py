@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+import subprocess
+from src.probe import read_video_info
+
+class OpenCVSource:
+    """
+    Frame source decoding with cv2.VideoCapture into full-resolution BGR frames.
+    """
+    name = "opencv"
+
+    def __init__(self, video_path):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def frame_count(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def fps(self):
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    def info(self):
+        """
+        returns: metadata record of the video, see src.probe
+        """
+        return read_video_info(self.cap, self.video_path)
+
+    def seek(self, frame_idx):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+
+    def read(self, out=None):
+        """
+        Decodes the next frame, into `out` when its geometry fits.
+        returns: the frame, or None at the end of the video
+        """
+        ret, frame = self.cap.read(out)
+        return frame if ret else None
+
+    def grab(self):
+        """
+        Advances past the next frame without converting it to an image.
+        returns: False at the end of the video
+        """
+        return self.cap.grab()
+
+    def timestamp(self):
+        """
+        returns: position of the last decoded frame in seconds
+        """
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def release(self):
+        self.cap.release()
+
+class FFmpegSource:
+    """
+    Frame source reading raw frames from an ffmpeg process's stdout.
+    Scaling and pixel-format conversion happen inside the decoder, so
+    Python only ever sees frames at the size and format it matches on.
+    scale: (width, height) of the delivered frames, or None for the source size
+    gray: deliver single-channel grayscale frames instead of BGR
+    hwaccel: value for ffmpeg's -hwaccel option, e.g. "auto" or "cuda"
+    threads: number of decoder threads, or None for ffmpeg's default
+    """
+    name = "ffmpeg"
+
+    def __init__(self, video_path, scale=None, gray=False, hwaccel=None, threads=None):
+        self.video_path = video_path
+        self.gray = gray
+        self.hwaccel = hwaccel
+        self.threads = threads
+
+        # Geometry, rate and length still come from the container
+        cap = cv2.VideoCapture(video_path)
+        self._opened = cap.isOpened()
+        self._info = read_video_info(cap, video_path)
+        cap.release()
+        self._fps = self._info["fps"] or 25.0
+        self._frame_count = self._info["total_frames"]
+
+        self.width, self.height = scale if scale else (self._info["width"], self._info["height"])
+        self.shape = (self.height, self.width) if gray else (self.height, self.width, 3)
+        self._frame_bytes = int(np.prod(self.shape))
+        self._scratch = None
+        self._proc = None
+        self._next_frame = 0 # index of the frame the next read returns
+        if self._opened:
+            self._start(0)
+
+    def _command(self, start_time):
+        cmd = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+        if self.hwaccel:
+            cmd.extend(["-hwaccel", self.hwaccel])
+        if self.threads:
+            cmd.extend(["-threads", str(self.threads)])
+        if start_time > 0:
+            cmd.extend(["-ss", f"{start_time:.6f}"])
+        cmd.extend(["-i", self.video_path, "-an", "-sn",
+                    "-vf", f"scale={self.width}:{self.height}",
+                    "-f", "rawvideo", "-pix_fmt", "gray" if self.gray else "bgr24", "-"])
+        return cmd
+
+    def _start(self, frame_idx):
+        self._stop_process()
+        try:
+            self._proc = subprocess.Popen(self._command(frame_idx / self._fps),
+                                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                          bufsize=self._frame_bytes)
+        except OSError:
+            # ffmpeg is not installed or cannot be run; reads then return nothing
+            self._opened = False
+            return
+        self._next_frame = frame_idx
+
+    def _stop_process(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.stdout.close()
+            self._proc.wait()
+            self._proc = None
+
+    def is_opened(self):
+        return self._opened
+
+    def frame_count(self):
+        return self._frame_count
+
+    def fps(self):
+        return self._fps
+
+    def info(self):
+        """
+        returns: metadata record of the video file, not of the scaled frames
+        """
+        return self._info
+
+    def seek(self, frame_idx):
+        self._start(frame_idx)
+
+    def _read_into(self, buf):
+        view = memoryview(buf).cast("B")
+        filled = 0
+        while filled < self._frame_bytes:
+            n = self._proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        self._next_frame += 1
+        return True
+
+    def read(self, out=None):
+        """
+        Reads the next frame, into `out` when its geometry fits.
+        returns: the frame, or None at the end of the video
+        """
+        if self._proc is None:
+            return None
+        if out is None or out.shape != self.shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+            out = np.empty(self.shape, np.uint8)
+        return out if self._read_into(out) else None
+
+    def grab(self):
+        if self._proc is None:
+            return False
+        if self._scratch is None:
+            self._scratch = np.empty(self.shape, np.uint8)
+        return self._read_into(self._scratch)
+
+    def timestamp(self):
+        return (self._next_frame - 1) / self._fps
+
+    def release(self):
+        self._stop_process()
+
+SOURCES = {
+    OpenCVSource.name: OpenCVSource,
+    FFmpegSource.name: FFmpegSource,
+}
+
+def open_source(video_path, kind="opencv", **options):
+    """
+    Opens a frame source of the given kind ("opencv" or "ffmpeg").
+    options: keyword arguments of the source class
+    """
+    if kind not in SOURCES:
+        raise ValueError(f"Unknown frame source: {kind}")
+    return SOURCES[kind](video_path, **options)
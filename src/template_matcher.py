@@ -0,0 +1,180 @@
+import cv2
+import json
+import numpy as np
+from src.matcher import FrameMatcher
+
+MIN_COARSE_SIZE = 8 # templates smaller than this at the coarse level are only searched at full size
+
+class ScaledTemplate:
+    """
+    One scale of a target template at full and at coarse resolution.
+    """
+    def __init__(self, image, scale, coarse):
+        size = (max(1, int(round(image.shape[1] * scale))), max(1, int(round(image.shape[0] * scale))))
+        self.scale = scale
+        self.image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        self.coarse = None
+        coarse_size = (size[0] // coarse, size[1] // coarse)
+        if min(coarse_size) >= MIN_COARSE_SIZE:
+            self.coarse = cv2.resize(self.image, coarse_size, interpolation=cv2.INTER_AREA)
+
+class PreparedTemplates:
+    """
+    Template pyramids of the targets for the geometry of one video.
+    window: (x, y, w, h) of the searched part of the frame in pixels
+    """
+    def __init__(self, frame_shape, window, aliases, templates):
+        self.frame_shape = frame_shape
+        self.window = window
+        self.aliases = aliases
+        self.templates = templates # per alias, list of ScaledTemplate
+        self.regions = []
+        self.skipped_regions = []
+
+    def __len__(self):
+        return len(self.aliases)
+
+def correlation(image, template):
+    """
+    returns: (best normalized correlation coefficient, its (x, y) location)
+    """
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, best, _, location = cv2.minMaxLoc(result)
+    return (best if np.isfinite(best) else 0.0), location
+
+class TemplateMatcher(FrameMatcher):
+    """
+    Finds targets that appear smaller, larger or shifted inside the frame,
+    such as logos and slates, with cv2.matchTemplate instead of comparing
+    whole frames. Every target is searched at several scales on a coarse
+    copy of the frame first; only the best coarse hit is confirmed at full
+    resolution in a small neighbourhood, and targets without a promising
+    coarse hit are rejected right there.
+    Targets are compared in grayscale; regions are not used in this mode.
+    """
+    supports_signatures = False
+    supports_static_gate = False # a small template barely moves the frame thumbnail
+
+    def __init__(self, min_correlation=0.8, scales=(1.0,), search_window=None, coarse=4,
+                 coarse_slack=0.15, **options):
+        """
+        min_correlation: minimum normalized correlation of a match (0.0 to 1.0)
+        scales: sizes to search for, relative to the target image
+        search_window: (x, y, w, h) in fractions of the frame to search, or
+                       None for the whole frame
+        coarse: downscale factor of the coarse search level
+        coarse_slack: how far below min_correlation a coarse hit may score
+                      and still be confirmed at full resolution
+        options: further FrameMatcher options, e.g. range grouping
+        """
+        super().__init__(**options)
+        self.min_correlation = min_correlation
+        self.scales = tuple(scales)
+        self.search_window = tuple(search_window) if search_window else None
+        self.coarse = max(1, coarse)
+        self.coarse_slack = coarse_slack
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.stats["coarse_rejected"] = 0
+
+    def settings_key(self):
+        return json.dumps({"mode": "template", "min_correlation": self.min_correlation,
+                           "scales": self.scales, "search_window": self.search_window,
+                           "coarse": self.coarse, "coarse_slack": self.coarse_slack},
+                          sort_keys=True)
+
+    def _window(self, frame_shape):
+        height, width = frame_shape[:2]
+        if self.search_window is None:
+            return (0, 0, width, height)
+        fx, fy, fw, fh = self.search_window
+        x, y = int(fx * width), int(fy * height)
+        w = max(1, min(width - x, int(round(fw * width))))
+        h = max(1, min(height - y, int(round(fh * height))))
+        return (x, y, w, h)
+
+    def prepare(self, targets, frame_shape, regions=None):
+        """
+        Builds the template pyramids once for a given video geometry.
+        targets: dict of alias -> image
+        returns: PreparedTemplates, cached until the targets change
+        """
+        frame_shape = tuple(frame_shape)
+        cached = self._prepared.get(frame_shape)
+        if cached is not None:
+            sources, prepared = cached
+            if len(sources) == len(targets) and all(
+                    sources.get(alias) is img for alias, img in targets.items()):
+                return prepared
+
+        window = self._window(frame_shape)
+        aliases, templates = [], []
+        for alias, img in targets.items():
+            gray = self._gray(img)
+            scaled = [ScaledTemplate(gray, scale, self.coarse) for scale in self.scales]
+            # Scales that do not fit into the search window can never match
+            scaled = [t for t in scaled if t.image.shape[0] <= window[3] and t.image.shape[1] <= window[2]]
+            aliases.append(alias)
+            templates.append(scaled)
+
+        prepared = PreparedTemplates(frame_shape, window, aliases, templates)
+        self._prepared[frame_shape] = (dict(targets), prepared)
+        return prepared
+
+    def _gray(self, img):
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        return np.ascontiguousarray(img, dtype=np.uint8)
+
+    def match(self, frame, prepared):
+        """
+        Returns the aliases of all prepared targets found in the frame.
+        """
+        self.stats["frames"] += 1
+        x, y, w, h = prepared.window
+        gray = self._gray(frame[y:y + h, x:x + w])
+        coarse = cv2.resize(gray, (w // self.coarse, h // self.coarse), interpolation=cv2.INTER_AREA) \
+            if self.coarse > 1 else gray
+
+        matched = []
+        coarse_rejected = 0
+        for alias, scaled in zip(prepared.aliases, prepared.templates):
+            found = self._find(gray, coarse, scaled)
+            if found:
+                matched.append(alias)
+            elif found is None:
+                coarse_rejected += 1
+        if coarse_rejected and coarse_rejected == len(prepared):
+            self.stats["coarse_rejected"] += 1
+        return matched
+
+    def _find(self, gray, coarse, scaled):
+        """
+        returns: True when found, None when rejected on the coarse level
+        """
+        # Coarse level: the best scale and location, or an early exit
+        best, best_template, best_location = -1.0, None, None
+        for t in scaled:
+            if t.coarse is None:
+                score, location = correlation(gray, t.image)
+                if score >= self.min_correlation:
+                    return True
+                continue
+            if t.coarse.shape[0] > coarse.shape[0] or t.coarse.shape[1] > coarse.shape[1]:
+                continue
+            score, location = correlation(coarse, t.coarse)
+            if score > best:
+                best, best_template, best_location = score, t, location
+        if best_template is None or best < self.min_correlation - self.coarse_slack:
+            return None
+
+        # Full resolution around the coarse hit
+        pad = 2 * self.coarse
+        th, tw = best_template.image.shape[:2]
+        x0 = max(0, best_location[0] * self.coarse - pad)
+        y0 = max(0, best_location[1] * self.coarse - pad)
+        x1 = min(gray.shape[1], best_location[0] * self.coarse + tw + pad)
+        y1 = min(gray.shape[0], best_location[1] * self.coarse + th + pad)
+        score, _ = correlation(gray[y0:y1, x0:x1], best_template.image)
+        return score >= self.min_correlation
@@ -1,107 +1,158 @@
-import cv2
-import os
+import time
 from PyQt6.QtCore import QThread, pyqtSignal, QMutex, QWaitCondition, QMutexLocker
+from src.scanner import VideoScanner, ParallelScanner, load_targets, load_regions, merge_results
+
+LOG_INTERVAL = 0.25 # seconds between batched log signals
 
 class FrameWorker(QThread):
     progress = pyqtSignal(int)
-    log = pyqtSignal(str)
+    log = pyqtSignal(str) # one or more lines, batched
+    range_found = pyqtSignal(str, dict) # target_alias, range, while scanning
     finished = pyqtSignal(dict) # target_alias -> list of ranges
 
-    def __init__(self, video_paths, target_images, matcher):
+    def __init__(self, video_paths, target_images, matcher, processes=1, segments=1, scan_options=None,
+                 regions=None):
+        """
+        processes: number of worker processes; with more than one, videos
+                   are scanned concurrently
+        segments: number of frame ranges each long video is split into so
+                  its ranges can be scanned concurrently too
+        scan_options: keyword arguments for VideoScanner, e.g. {"stride": 12}
+        regions: dict of path -> (x, y, w, h) or mask image path of targets
+                 that are only compared inside that region
+        """
         super().__init__()
         self.video_paths = video_paths
         self.target_images = target_images # path -> alias
         self.matcher = matcher
+        self.processes = processes
+        self.segments = segments
+        self.scan_options = scan_options or {}
+        self.regions = regions or {}
         self.mutex = QMutex()
         self.condition = QWaitCondition()
         self._is_running = True
         self._is_paused = False
+        self._parallel = None
+        self.log_mutex = QMutex()
+        self._pending_logs = []
+        self._last_flush = 0.0
+
+    def _log(self, message):
+        """
+        Queues a log message; queued messages go out as one log signal at
+        most every LOG_INTERVAL seconds, so the GUI appends them in bulk.
+        """
+        with QMutexLocker(self.log_mutex):
+            self._pending_logs.append(message)
+        self.flush_due()
+
+    def flush_due(self):
+        """
+        Sends queued messages once LOG_INTERVAL has passed since the last
+        flush. Also called from progress reports, so a message never waits
+        for the next log call.
+        """
+        with QMutexLocker(self.log_mutex):
+            due = self._pending_logs and time.monotonic() - self._last_flush >= LOG_INTERVAL
+        if due:
+            self.flush_logs()
+
+    def flush_logs(self):
+        with QMutexLocker(self.log_mutex):
+            self._last_flush = time.monotonic()
+            if self._pending_logs:
+                self.log.emit("\n".join(self._pending_logs))
+                self._pending_logs = []
 
     def pause(self):
+        self.flush_logs()
         with QMutexLocker(self.mutex):
             self._is_paused = True
+            if self._parallel:
+                self._parallel.pause()
             self.log.emit("Processing paused.")
 
     def resume(self):
         with QMutexLocker(self.mutex):
             self._is_paused = False
+            if self._parallel:
+                self._parallel.resume()
             self.condition.wakeAll()
             self.log.emit("Processing resumed.")
 
     def stop(self):
+        self.flush_logs()
         with QMutexLocker(self.mutex):
             self._is_running = False
             self._is_paused = False
+            if self._parallel:
+                self._parallel.stop()
             self.condition.wakeAll()
             self.log.emit("Processing stopped by user.")
 
+    def _should_continue(self):
+        # Handle pause and stop
+        with QMutexLocker(self.mutex):
+            while self._is_paused:
+                self.condition.wait(self.mutex)
+            return self._is_running
+
     def run(self):
-        results = {}
-        
         # Load target images
-        target_data = {}
-        for path, alias in self.target_images.items():
-            img = cv2.imread(path)
-            if img is not None:
-                target_data[alias] = img
-                results[alias] = []
-            else:
-                self.log.emit(f"Error: Could not load target image {path}")
+        target_data = load_targets(self.target_images, log=self._log)
+        scan_options = dict(self.scan_options)
+        if self.regions:
+            scan_options["regions"] = load_regions(self.regions, self.target_images, log=self._log,
+                                                   target_data=target_data)
+
+        if self.processes > 1 and (len(self.video_paths) > 1 or self.segments > 1):
+            scanned = self._scan_parallel(scan_options)
+        else:
+            scanned = self._scan_serial(target_data, scan_options)
+        results = merge_results(target_data, scanned)
+
+        self.flush_logs()
+        self.progress.emit(100)
+        self.finished.emit(results)
 
+    def _scan_serial(self, target_data, scan_options):
+        scanner = VideoScanner(self.matcher, target_data, log=self._log,
+                               should_continue=self._should_continue, on_range=self.range_found.emit,
+                               **scan_options)
+        scanned = []
         total_videos = len(self.video_paths)
+        last_percent = [-1]
         for v_idx, video_path in enumerate(self.video_paths):
             # Check for stop
             with QMutexLocker(self.mutex):
                 if not self._is_running:
                     break
 
-            self.log.emit(f"Processing video: {os.path.basename(video_path)}")
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                self.log.emit(f"Error: Could not open video {video_path}")
-                continue
-
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            matches_per_target = {alias: [] for alias in target_data}
-
-            frame_idx = 0
-            while True:
-                # Handle pause and stop
-                self.mutex.lock()
-                while self._is_paused:
-                    self.condition.wait(self.mutex)
-                if not self._is_running:
-                    self.mutex.unlock()
-                    break
-                self.mutex.unlock()
-
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-                
-                for alias, target_img in target_data.items():
-                    if self.matcher.compare(frame, target_img):
-                        matches_per_target[alias].append((frame_idx, timestamp))
-                        self.log.emit(f"Match found for '{alias}' at {timestamp:.2f}s")
-                
-                frame_idx += 1
-                if frame_idx % 10 == 0: # Update progress every 10 frames
-                    p = int(((v_idx + (frame_idx / total_frames)) / total_videos) * 100)
+            def report(frame_idx, total_frames, v_idx=v_idx):
+                self.flush_due()
+                p = int(((v_idx + (frame_idx / max(total_frames, 1))) / total_videos) * 100)
+                if p != last_percent[0]:
+                    last_percent[0] = p
                     self.progress.emit(p)
 
-            cap.release()
-
-            # Group matches into ranges
-            for alias, matches in matches_per_target.items():
-                ranges = self.matcher.group_matches(matches)
-                video_name = os.path.basename(video_path)
-                for r in ranges:
-                    r['video'] = video_name
-                    r['video_path'] = video_path
-                results[alias].extend(ranges)
-                self.log.emit(f"Found {len(ranges)} occurrences for '{alias}' in {video_name}")
+            scanned.append(scanner.scan(video_path, progress=report))
+        return scanned
 
-        self.progress.emit(100)
-        self.finished.emit(results)
+    def _scan_parallel(self, scan_options):
+        processes = min(self.processes, len(self.video_paths) * self.segments)
+        self._log(f"Scanning {len(self.video_paths)} videos in {processes} processes")
+        with QMutexLocker(self.mutex):
+            if not self._is_running:
+                return []
+            self._parallel = ParallelScanner(self.matcher, self.target_images, processes,
+                                             segments=self.segments, scan_options=scan_options,
+                                             log=self._log, progress=self.progress.emit,
+                                             on_range=self.range_found.emit, heartbeat=self.flush_due)
+            if self._is_paused:
+                self._parallel.pause()
+        try:
+            return self._parallel.scan(self.video_paths)
+        finally:
+            with QMutexLocker(self.mutex):
+                self._parallel = None
@@ -0,0 +1,29 @@
+import unittest
+import os
+import tempfile
+from benchmarks.run import run_benchmarks, sample_frames, synthesize_video
+
+class TestBenchmarks(unittest.TestCase):
+    def test_smoke_run(self):
+        report = run_benchmarks(sizes=("480p",), frames=6, target_counts=(1,), marker_modes=("audio",))
+        self.assertIn("opencv", report["environment"])
+        kinds = {r["benchmark"] for r in report["results"]}
+        self.assertEqual(kinds, {"compare", "match", "worker", "marker"})
+        workers = [r for r in report["results"] if r["benchmark"] == "worker"]
+        self.assertEqual([r["static_gate"] for r in workers], [False, True])
+        for worker in workers:
+            self.assertEqual(worker["ranges"], 1)
+            self.assertGreater(worker["fps"], 0)
+
+    def test_frame_sample_fits_budget(self):
+        path = os.path.join(tempfile.mkdtemp(), "video.avi")
+        try:
+            synthesize_video(path, (64, 48), 12)
+            self.assertEqual(len(sample_frames(path, budget=3 * 64 * 48 * 3)), 3)
+            self.assertEqual(len(sample_frames(path)), 12)
+        finally:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from src.cache import ResultCache, video_fingerprint, image_hash
+from src.matcher import FrameMatcher
+from src.scanner import VideoScanner, ParallelScanner, load_targets
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.video = os.path.join(self.cache_dir, "video.avi")
+        self.white = os.path.join(self.cache_dir, "white.png")
+        self.gray = os.path.join(self.cache_dir, "gray.png")
+
+        white = np.ones((48, 64, 3), np.uint8) * 255
+        gray = np.ones((48, 64, 3), np.uint8) * 128
+        cv2.imwrite(self.white, white)
+        cv2.imwrite(self.gray, gray)
+        out = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+        for f in range(30):
+            out.write(white if f < 5 else gray if f >= 20 else np.zeros((48, 64, 3), np.uint8))
+        out.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_put_and_get(self):
+        cache = ResultCache(self.cache_dir)
+        self.assertIsNone(cache.get("v", "t", "s"))
+        runs = [{"start_frame": 1, "end_frame": 2, "start_time": 0.04, "end_time": 0.08}]
+        cache.put("v", "t", "s", runs)
+        self.assertEqual(cache.get("v", "t", "s"), runs)
+        self.assertIsNone(cache.get("v", "t", "other settings"))
+        cache.clear()
+        self.assertIsNone(cache.get("v", "t", "s"))
+
+    def test_fingerprints(self):
+        self.assertEqual(video_fingerprint(self.video), video_fingerprint(self.video))
+        img = np.zeros((4, 4, 3), np.uint8)
+        self.assertEqual(image_hash(img), image_hash(img.copy()))
+        self.assertNotEqual(image_hash(img), image_hash(img + 1))
+
+    def test_scanner_only_scans_new_targets(self):
+        cache = ResultCache(self.cache_dir)
+        first = VideoScanner(FrameMatcher(), load_targets({self.white: "white"}), cache=cache)
+        expected_white = first.scan(self.video)["white"]
+
+        logs = []
+        scanner = VideoScanner(FrameMatcher(), load_targets({self.white: "white"}), log=logs.append, cache=cache)
+        self.assertEqual(scanner.scan(self.video)["white"], expected_white)
+        self.assertIn("Using cached results for video.avi", logs)
+        self.assertFalse(any(line.startswith("Processing video") for line in logs))
+
+        logs.clear()
+        targets = load_targets({self.white: "white", self.gray: "gray"})
+        scanner = VideoScanner(FrameMatcher(), targets, log=logs.append, cache=cache)
+        results = scanner.scan(self.video)
+        self.assertIn("Using cached results for 1 targets in video.avi, scanning 1 new targets", logs)
+        self.assertEqual(list(results), ["white", "gray"])
+        self.assertEqual((results["gray"][0]["start_frame"], results["gray"][0]["end_frame"]), (20, 29))
+
+        # Other matcher settings do not reuse the cached matches
+        logs.clear()
+        VideoScanner(FrameMatcher(threshold=0.2), targets, log=logs.append, cache=cache).scan(self.video)
+        self.assertIn("Processing video: video.avi", logs)
+
+    def test_parallel_scanner_uses_cache(self):
+        cache = ResultCache(self.cache_dir)
+        targets = {self.white: "white"}
+        expected = VideoScanner(FrameMatcher(), load_targets(targets), cache=cache).scan(self.video)
+
+        logs = []
+        parallel = ParallelScanner(FrameMatcher(), targets, 2, scan_options={"cache": cache}, log=logs.append)
+        self.assertEqual(parallel.scan([self.video, self.video]), [expected, expected])
+        self.assertFalse(any(line.startswith("Processing video") for line in logs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+import cv2
+import numpy as np
+from src.cli import main, parse_targets, parse_size
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.target = "test_cli_target.png"
+        self.video = "test_cli_video.avi"
+        self.output = "test_cli_results.json"
+
+        white = np.ones((48, 64, 3), np.uint8) * 255
+        cv2.imwrite(self.target, white)
+        out = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+        for f in range(30):
+            out.write(white if 10 <= f < 15 else np.zeros((48, 64, 3), np.uint8))
+        out.release()
+
+    def tearDown(self):
+        for f in [self.target, self.video, self.output]:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def test_parse_targets(self):
+        targets = parse_targets(["intro=a/intro.png", "b.png"])
+        self.assertEqual(targets[os.path.abspath("a/intro.png")], "intro")
+        self.assertEqual(targets[os.path.abspath("b.png")], "b.png")
+        self.assertEqual(parse_size("320x180"), (320, 180))
+
+    def test_scan_writes_results(self):
+        code = main(["scan", "--videos", self.video, "--targets", f"white={self.target}",
+                     "--threshold", "0.05", "--stride", "3", "--out", self.output, "--quiet"])
+        self.assertEqual(code, 0)
+        with open(self.output) as f:
+            results = json.load(f)
+        self.assertEqual(len(results["white"]), 1)
+        r = results["white"][0]
+        self.assertEqual((r["start_frame"], r["end_frame"], r["video"]), (10, 14, self.video))
+
+    def test_index_then_scan_with_signatures(self):
+        signatures = tempfile.mkdtemp()
+        try:
+            self.assertEqual(main(["index", "--videos", self.video, "--signature-dir", signatures, "--quiet"]), 0)
+            code = main(["scan", "--videos", self.video, "--targets", f"white={self.target}",
+                         "--signature-dir", signatures, "--out", self.output, "--quiet"])
+            self.assertEqual(code, 0)
+            with open(self.output) as f:
+                r = json.load(f)["white"][0]
+            self.assertEqual((r["start_frame"], r["end_frame"]), (10, 14))
+        finally:
+            shutil.rmtree(signatures)
+
+    def test_scan_skips_invalid_region(self):
+        code = main(["scan", "--videos", self.video, "--targets", f"white={self.target}",
+                     "--region", "white=500,500,10,10", "--out", self.output, "--quiet"])
+        self.assertEqual(code, 0)
+        with open(self.output) as f:
+            self.assertEqual(len(json.load(f)["white"]), 1)
+
+    def test_scan_reports_missing_ffmpeg(self):
+        from unittest.mock import patch
+        with patch('subprocess.Popen', side_effect=FileNotFoundError("ffmpeg")) as popen:
+            code = main(["scan", "--videos", self.video, "--targets", f"white={self.target}",
+                         "--source", "ffmpeg", "--threads", "2", "--out", self.output, "--quiet"])
+        self.assertEqual(code, 1)
+        self.assertIn("-threads", popen.call_args[0][0])
+
+    def test_scan_fails_without_targets(self):
+        code = main(["scan", "--videos", self.video, "--targets", "missing.png", "--quiet"])
+        self.assertEqual(code, 1)
+
+    def test_cli_does_not_import_qt(self):
+        check = "import sys; import src.cli; print('PyQt6' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+if __name__ == "__main__":
+    unittest.main()
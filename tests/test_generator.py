@@ -1,8 +1,9 @@
 import unittest
 import os
+import wave
 import cv2
 import numpy as np
-from src.generator import MarkerGenerator
+from src.generator import BatchMarkerGenerator, MarkerGenerator, marker_segments, write_tone_track
 
 class TestMarkerGenerator(unittest.TestCase):
     def setUp(self):
@@ -10,6 +11,8 @@ class TestMarkerGenerator(unittest.TestCase):
         self.test_video = "test_source.mp4"
         self.test_image = "test_target.png"
         self.output_video = "test_markers.mp4"
+        self.output_audio = "test_tones.wav"
+        self.batch_outputs = ["test_batch_1.wav", "test_batch_2.wav", "test_batch_3.wav"]
         
         # Create a dummy video
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -24,7 +27,7 @@ class TestMarkerGenerator(unittest.TestCase):
         cv2.imwrite(self.test_image, img)
 
     def tearDown(self):
-        for f in [self.test_video, self.test_image, self.output_video]:
+        for f in [self.test_video, self.test_image, self.output_video, self.output_audio] + self.batch_outputs:
             if os.path.exists(f):
                 os.remove(f)
 
@@ -59,6 +62,30 @@ class TestMarkerGenerator(unittest.TestCase):
         
         cap.release()
 
+    def test_marker_video_boundaries_are_frame_exact(self):
+        ranges = [(10, 20), (101, 101), (333, 470), (899, 899)]
+        results = [{"start_frame": s, "end_frame": e, "target_path": self.test_image} for s, e in ranges]
+        for fps in (30000 / 1001, 60.0):
+            info = {"width": 64, "height": 48, "fps": fps, "total_frames": 900}
+            self.assertTrue(self.generator.create_marker_file(self.test_video, results, self.output_video,
+                                                              mode="video", video_info=info))
+            cap = cv2.VideoCapture(self.output_video)
+            lit = []
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                lit.append(np.mean(frame) > 128)
+            cap.release()
+            self.assertEqual(len(lit), 900)
+            for start, end in ranges:
+                self.assertTrue(lit[start], (fps, start))
+                self.assertTrue(lit[end], (fps, end))
+                self.assertFalse(lit[start - 1], (fps, start - 1))
+                if end + 1 < 900:
+                    self.assertFalse(lit[end + 1], (fps, end + 1))
+            self.assertTrue(lit[899])
+
     def test_marker_generation_audio_only(self):
         results = [
             {"start_frame": 10, "end_frame": 20, "target_path": self.test_image}
@@ -77,5 +104,55 @@ class TestMarkerGenerator(unittest.TestCase):
         # Basic check: file is non-empty
         self.assertGreater(os.path.getsize(self.output_video), 0)
 
+    def test_generator_exports_again_after_stop(self):
+        results = [
+            {"start_frame": 10, "end_frame": 20, "target_path": self.test_image}
+        ]
+        self.generator.stop()
+        self.assertTrue(self.generator.create_marker_file(self.test_video, results, self.output_audio, mode="audio"))
+        self.assertTrue(os.path.exists(self.output_audio))
+
+    def test_batch_marker_generation(self):
+        results = [
+            {"start_frame": 10, "end_frame": 20, "target_path": self.test_image}
+        ]
+        jobs = [(self.test_video, results, path, None) for path in self.batch_outputs[:2]]
+        jobs.append(("missing.mp4", results, self.batch_outputs[2], None))
+        generator = BatchMarkerGenerator(max_jobs=2)
+        progress = []
+        generator.progress.connect(progress.append)
+        self.assertEqual(generator.create_marker_files(jobs, mode="audio"), 2)
+        self.assertTrue(os.path.exists(self.batch_outputs[0]))
+        self.assertTrue(os.path.exists(self.batch_outputs[1]))
+        self.assertFalse(os.path.exists(self.batch_outputs[2]))
+        self.assertEqual(progress[-1], 100)
+
+    def test_marker_segments(self):
+        results = [
+            {"start_frame": 10, "end_frame": 20, "target_path": "a.png"},
+            {"start_frame": 15, "end_frame": 30, "target_path": "b.png"},
+            {"start_frame": 50, "end_frame": 70, "target_path": "a.png"}
+        ]
+        self.assertEqual(marker_segments(results, 60), [
+            (None, 0, 10), ("a.png", 10, 5), ("b.png", 15, 16), (None, 31, 19), ("a.png", 50, 10)
+        ])
+        self.assertEqual(marker_segments([], 60), [(None, 0, 60)])
+
+    def test_tone_track(self):
+        results = [{"start_frame": 30, "end_frame": 60, "target_path": self.test_image}]
+        # Small chunks so the second beep straddles a chunk boundary
+        self.assertTrue(write_tone_track(self.output_audio, results, 30.0, 3.0, sample_rate=8000,
+                                         chunk_seconds=0.35))
+        with wave.open(self.output_audio) as f:
+            self.assertEqual(f.getnchannels(), 2)
+            self.assertEqual(f.getnframes(), 24000)
+            samples = np.frombuffer(f.readframes(f.getnframes()), "<i2").reshape(-1, 2)[:, 0]
+        loud = np.flatnonzero(np.abs(samples) > 0)
+        # Beeps of 0.1s at 1.0s and at 1.9s
+        self.assertEqual(loud.min(), 8001)
+        self.assertLess(loud.max(), 16000)
+        self.assertFalse(np.any(samples[8800:15200]))
+        self.assertAlmostEqual(np.abs(samples).max(), 32767 / 8, delta=2)
+
 if __name__ == "__main__":
     unittest.main()
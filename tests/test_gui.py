@@ -66,6 +66,83 @@ class TestGuiLayout(unittest.TestCase):
             self.assertEqual(self.window.images[abs_path], 'new_alias')
             self.assertIn('new_alias', item.text())
 
+    def test_edit_region(self):
+        from unittest.mock import patch
+        import os
+        with patch('PyQt6.QtWidgets.QFileDialog.getOpenFileNames', return_value=(['image1.png'], '')), \
+             patch('os.path.exists', return_value=True):
+            self.window.add_images()
+
+        abs_path = os.path.abspath('image1.png')
+        item = self.window.image_list.item(0)
+        self.window.image_list.setCurrentItem(item)
+        with patch('PyQt6.QtWidgets.QInputDialog.getText', return_value=('10,20,30,40', True)):
+            self.window.edit_region()
+        self.assertEqual(self.window.regions[abs_path], (10, 20, 30, 40))
+        self.assertIn('region', item.text())
+
+        with patch('PyQt6.QtWidgets.QInputDialog.getText', return_value=('', True)):
+            self.window.edit_region()
+        self.assertNotIn(abs_path, self.window.regions)
+
+    def test_static_frames_are_opt_in(self):
+        from unittest.mock import patch
+        self.window.videos = ["video1.mp4"]
+        self.window.images = {"image1.png": "image1"}
+        with patch('src.gui.FrameWorker') as worker, patch('src.gui.ResultCache'):
+            self.window.start_processing()
+            self.assertNotIn("static_tolerance", worker.call_args[1]["scan_options"])
+            self.window.static_check.setChecked(True)
+            self.window.start_processing()
+            self.assertEqual(worker.call_args[1]["scan_options"]["static_tolerance"], 0.5)
+
+    def test_edit_region_rejects_invalid_rectangle(self):
+        from unittest.mock import patch
+        import os
+        import cv2
+        import numpy as np
+        path = os.path.abspath("test_gui_region.png")
+        cv2.imwrite(path, np.zeros((48, 64, 3), np.uint8))
+        try:
+            with patch('PyQt6.QtWidgets.QFileDialog.getOpenFileNames', return_value=([path], '')):
+                self.window.add_images()
+            self.window.image_list.setCurrentItem(self.window.image_list.item(0))
+            with patch('PyQt6.QtWidgets.QInputDialog.getText', return_value=('500,500,10,10', True)):
+                self.window.edit_region()
+            self.assertNotIn(path, self.window.regions)
+            self.assertIn("WARNING: Region not set: the rectangle does not fit into the 64x48 image",
+                          self.window.log_view.toPlainText())
+        finally:
+            os.remove(path)
+
+    def test_process_pool_is_opt_in(self):
+        from unittest.mock import patch
+        import os
+        self.window.videos = ["video1.mp4"]
+        self.window.images = {"image1.png": "image1"}
+        with patch('src.gui.FrameWorker') as worker, patch('src.gui.ResultCache'):
+            self.window.start_processing()
+            self.assertEqual((worker.call_args[1]["processes"], worker.call_args[1]["segments"]), (1, 1))
+            self.window.parallel_check.setChecked(True)
+            self.window.start_processing()
+            self.assertEqual(worker.call_args[1]["processes"], os.cpu_count() or 1)
+
+    def test_result_cache_is_opt_in(self):
+        from unittest.mock import patch
+        self.window.videos = ["video1.mp4"]
+        self.window.images = {"image1.png": "image1"}
+        with patch('src.gui.FrameWorker') as worker, patch('src.gui.ResultCache') as cache:
+            self.window.start_processing()
+            self.assertNotIn("cache", worker.call_args[1]["scan_options"])
+            cache.assert_not_called()
+            self.window.cache_check.setChecked(True)
+            self.window.start_processing()
+            self.assertIs(worker.call_args[1]["scan_options"]["cache"], cache.return_value)
+
+            self.window.clear_cache_btn.click()
+            cache.return_value.clear.assert_called_once_with()
+        self.assertIn("Cleared earlier results.", self.window.log_view.toPlainText())
+
     def test_update_progress(self):
         import time
         self.window.start_time = time.time() - 10
@@ -94,6 +171,38 @@ class TestGuiLayout(unittest.TestCase):
         self.assertTrue(self.window.gen_audio_btn.isEnabled())
         self.assertTrue(self.window.gen_both_btn.isEnabled())
 
+    def test_generate_markers_for_every_video(self):
+        from unittest.mock import patch
+        import os
+        image = os.path.abspath('image1.png')
+        self.window.images = {image: "target1"}
+        self.window.last_results = {
+            "target1": [
+                {"start_frame": 10, "end_frame": 15, "video_path": "/videos/v1.mp4",
+                 "video_info": {"width": 640, "height": 480, "fps": 30.0, "total_frames": 60}},
+                {"start_frame": 50, "end_frame": 55, "video_path": "/videos/v2.mp4"},
+                {"start_frame": 70, "end_frame": 75, "video_path": "/archive/v1.mp4"}
+            ]
+        }
+        with patch('PyQt6.QtWidgets.QFileDialog.getExistingDirectory', return_value='/out'), \
+             patch('src.gui.MarkerWorker') as worker:
+            self.window.generate_markers("video")
+        jobs, mode = worker.call_args[0]
+        self.assertEqual(mode, "video")
+        self.assertEqual(jobs, [
+            ("/videos/v1.mp4", [{"start_frame": 10, "end_frame": 15, "target_path": image}],
+             os.path.join('/out', 'videos_v1_markers.mp4'), {"width": 640, "height": 480, "fps": 30.0, "total_frames": 60}),
+            ("/videos/v2.mp4", [{"start_frame": 50, "end_frame": 55, "target_path": image}],
+             os.path.join('/out', 'v2_markers.mp4'), None),
+            ("/archive/v1.mp4", [{"start_frame": 70, "end_frame": 75, "target_path": image}],
+             os.path.join('/out', 'archive_v1_markers.mp4'), None)
+        ])
+
+    def test_marker_file_names_are_unique(self):
+        from src.gui import marker_file_names
+        self.assertEqual(marker_file_names(["/a/rec/v1.mp4", "/b/rec/v1.mp4", "/c/v2.mkv"], ".wav"),
+                         ["rec_v1_markers.wav", "rec_v1_markers_2.wav", "v2_markers.wav"])
+
     def test_display_results(self):
         # Mock results: target -> list of ranges
         results = {
@@ -1,6 +1,7 @@
 import unittest
+import cv2
 import numpy as np
-from src.matcher import FrameMatcher
+from src.matcher import FrameMatcher, RangeBuilder
 
 class TestFrameMatcher(unittest.TestCase):
     def setUp(self):
@@ -20,6 +21,108 @@ class TestFrameMatcher(unittest.TestCase):
         img2 = np.zeros((50, 50, 3), dtype=np.uint8)
         self.assertTrue(self.matcher.compare(img1, img2))
 
+    def test_prepare_resizes_targets_to_frame(self):
+        targets = {"a": np.zeros((50, 50, 3), dtype=np.uint8), "b": np.zeros((50, 50), dtype=np.uint8)}
+        prepared = self.matcher.prepare(targets, (100, 120, 3))
+        self.assertEqual(prepared.aliases, ["a", "b"])
+        for img in prepared.images:
+            self.assertEqual(img.shape, (100, 120, 3))
+
+    def test_prepare_is_cached_per_geometry(self):
+        targets = {"a": np.zeros((50, 50, 3), dtype=np.uint8)}
+        first = self.matcher.prepare(targets, (100, 100, 3))
+        self.assertIs(self.matcher.prepare(targets, (100, 100, 3)), first)
+        self.assertIsNot(self.matcher.prepare(targets, (200, 200, 3)), first)
+
+        targets["b"] = np.zeros((50, 50, 3), dtype=np.uint8)
+        self.assertEqual(len(self.matcher.prepare(targets, (100, 100, 3))), 2)
+
+    def test_compare_many_scores_match_compare(self):
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, (20, 30, 3), dtype=np.uint8)
+        targets = {
+            "same": frame.copy(),
+            "noisy": np.clip(frame.astype(int) + 5, 0, 255).astype(np.uint8),
+            "other": rng.integers(0, 256, (20, 30, 3), dtype=np.uint8),
+        }
+        prepared = self.matcher.prepare(targets, frame.shape)
+        scores = self.matcher.compare_many(frame, prepared.stack)
+        self.assertEqual(scores.shape, (3,))
+        for score, img in zip(scores, prepared.images):
+            self.assertAlmostEqual(score, np.mean(np.abs(frame.astype(int) - img)) / 255.0)
+        self.assertEqual(self.matcher.match(frame, prepared), ["same", "noisy"])
+
+    def test_prefilter_keeps_results_and_counts_rejections(self):
+        rng = np.random.default_rng(1)
+        base = rng.integers(0, 256, (36, 64, 3), dtype=np.uint8)
+        targets = {"base": base, "other": 255 - base}
+        frames = [base, np.clip(base.astype(int) + 10, 0, 255).astype(np.uint8),
+                  np.clip(base.astype(int) + 13, 0, 255).astype(np.uint8),
+                  rng.integers(0, 256, (36, 64, 3), dtype=np.uint8), np.zeros_like(base)]
+
+        plain = FrameMatcher(threshold=0.05)
+        filtered = FrameMatcher(threshold=0.05, prefilter=True)
+        for frame in frames:
+            expected = plain.match(frame, plain.prepare(targets, frame.shape))
+            self.assertEqual(filtered.match(frame, filtered.prepare(targets, frame.shape)), expected)
+
+        self.assertEqual(filtered.stats["frames"], len(frames))
+        self.assertGreater(filtered.stats["prefilter_rejected"], 0)
+        filtered.reset_stats()
+        self.assertEqual(filtered.stats["prefilter_rejected"], 0)
+
+    def test_region_targets_ignore_the_rest_of_the_frame(self):
+        target = np.zeros((36, 64, 3), np.uint8)
+        target[2:10, 50:60] = 255 # corner logo
+        # The target at twice its size with the picture below the logo changed
+        frame = cv2.resize(target, (128, 72))
+        frame[30:] = np.random.default_rng(1).integers(0, 256, (42, 128, 3), dtype=np.uint8)
+
+        mask = np.zeros((36, 64), np.uint8)
+        mask[2:10, 50:60] = 255
+        targets = {"rect": target, "mask": target, "whole": target}
+        regions = {"rect": (50, 2, 10, 8), "mask": mask}
+        prepared = self.matcher.prepare(targets, frame.shape, regions)
+        self.assertEqual(len(prepared), 3)
+        self.assertEqual((prepared.regions[0].w, prepared.regions[0].h), (20, 16))
+        self.assertEqual(sorted(self.matcher.match(frame, prepared)), ["mask", "rect"])
+        self.assertIs(self.matcher.prepare(targets, frame.shape, regions), prepared)
+
+    def test_pickling_drops_prepared_targets(self):
+        import pickle
+        target = np.zeros((360, 640, 3), np.uint8)
+        prepared = self.matcher.prepare({"a": target, "b": target}, target.shape)
+        self.matcher.match(target, prepared)
+        copy = pickle.loads(pickle.dumps(self.matcher))
+        self.assertLess(len(pickle.dumps(self.matcher)), 10000)
+        self.assertEqual(copy.threshold, self.matcher.threshold)
+        self.assertIn("a", copy.prepare({"a": target}, target.shape).aliases)
+
+    def test_unusable_regions_are_skipped(self):
+        target = np.zeros((36, 64, 3), np.uint8)
+        targets = {"rect": target, "mask": target}
+        regions = {"rect": (500, 500, 10, 10), "mask": np.zeros((36, 64), np.uint8)}
+        prepared = self.matcher.prepare(targets, target.shape, regions)
+        self.assertEqual(prepared.regions, [])
+        self.assertEqual(prepared.aliases, ["rect", "mask"])
+        self.assertEqual([alias for alias, _ in prepared.skipped_regions], ["rect", "mask"])
+
+    def test_early_exit_matches_like_full_comparison(self):
+        rng = np.random.default_rng(5)
+        base = rng.integers(0, 256, (36, 64, 3), dtype=np.uint8)
+        targets = {"base": base, "dark": np.zeros_like(base)}
+        frames = [base, np.clip(base.astype(int) + 10, 0, 255).astype(np.uint8),
+                  np.clip(base.astype(int) + 14, 0, 255).astype(np.uint8), np.full_like(base, 200),
+                  np.full_like(base, 8), rng.integers(0, 256, (36, 64, 3), dtype=np.uint8)]
+
+        plain = FrameMatcher(threshold=0.05)
+        tiled = FrameMatcher(threshold=0.05, early_exit=True)
+        for frame in frames:
+            expected = plain.match(frame, plain.prepare(targets, frame.shape))
+            self.assertEqual(tiled.match(frame, tiled.prepare(targets, frame.shape)), expected)
+            self.assertEqual(tiled.compare(frame, base), plain.compare(frame, base))
+        self.assertGreater(tiled.stats["tile_rejected"], 0)
+
     def test_group_consecutive_frames(self):
         # frames: (frame_number, timestamp)
         self.assertEqual(self.matcher.group_matches([]), [])
@@ -37,5 +140,29 @@ class TestFrameMatcher(unittest.TestCase):
         result = self.matcher.group_matches(matches)
         self.assertEqual(result, expected)
 
+    def test_range_builder_streams_closed_ranges(self):
+        closed = []
+        builder = RangeBuilder(on_range=closed.append)
+        for frame_idx in (10, 11, 12):
+            builder.add(frame_idx, frame_idx / 10)
+        self.assertEqual(closed, [])
+        builder.add(20, 2.0)
+        self.assertEqual(closed, [{"start_frame": 10, "end_frame": 12, "start_time": 1.0, "end_time": 1.2}])
+
+        # A run continuing the open range extends it
+        builder.add_range({"start_frame": 21, "end_frame": 25, "start_time": 2.1, "end_time": 2.5})
+        self.assertEqual(builder.finish()[-1], {"start_frame": 20, "end_frame": 25, "start_time": 2.0, "end_time": 2.5})
+        self.assertEqual(len(closed), 2)
+
+    def test_group_bridges_gaps_and_drops_short_ranges(self):
+        matches = [(10, 1.0), (11, 1.1), (13, 1.3), (14, 1.4), (20, 2.0), (40, 4.0), (41, 4.1)]
+        matcher = FrameMatcher(max_gap=1, min_frames=2)
+        self.assertEqual([(r["start_frame"], r["end_frame"]) for r in matcher.group_matches(matches)],
+                         [(10, 14), (40, 41)])
+
+        matcher = FrameMatcher(max_gap_time=0.65, min_duration=0.5)
+        self.assertEqual([(r["start_frame"], r["end_frame"]) for r in matcher.group_matches(matches)],
+                         [(10, 20)])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import os
+import cv2
+import numpy as np
+from unittest.mock import patch
+from src.probe import ProbeCache, probe_video
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        self.video = "test_probe.avi"
+        self.write_video(20)
+
+    def tearDown(self):
+        if os.path.exists(self.video):
+            os.remove(self.video)
+
+    def write_video(self, frames):
+        out = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+        for _ in range(frames):
+            out.write(np.zeros((48, 64, 3), np.uint8))
+        out.release()
+
+    def test_probe_video(self):
+        info = probe_video(self.video)
+        self.assertEqual((info["width"], info["height"]), (64, 48))
+        self.assertEqual(info["fps"], 25.0)
+        self.assertEqual(info["total_frames"], 20)
+        self.assertAlmostEqual(info["duration"], 0.8)
+        self.assertEqual(info["codec"], "MJPG")
+        with self.assertRaises(ValueError):
+            probe_video("missing.avi")
+
+    def test_cache_probes_once_until_the_file_changes(self):
+        cache = ProbeCache()
+        with patch("src.probe.probe_video", side_effect=probe_video) as probe:
+            self.assertEqual(cache.get(self.video)["total_frames"], 20)
+            self.assertEqual(cache.get(self.video)["total_frames"], 20)
+            self.assertEqual(probe.call_count, 1)
+
+            self.write_video(30)
+            self.assertEqual(cache.get(self.video)["total_frames"], 30)
+            self.assertEqual(probe.call_count, 2)
+
+    def test_put_records_are_served(self):
+        cache = ProbeCache()
+        self.assertIsNone(cache.lookup(self.video))
+        cache.put(self.video, {"total_frames": 99})
+        self.assertEqual(cache.lookup(self.video), {"total_frames": 99})
+        self.assertEqual(cache.get(self.video), {"total_frames": 99})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import unittest
+import os
+import cv2
+import numpy as np
+from src.matcher import FrameMatcher
+from src.scanner import VideoScanner, ParallelScanner, load_targets, load_regions, split_segments
+
+class TestScanner(unittest.TestCase):
+    def setUp(self):
+        self.target = "test_scan_target.png"
+        self.videos = ["test_scan_a.avi", "test_scan_b.avi"]
+
+        white = np.ones((48, 64, 3), np.uint8) * 255
+        cv2.imwrite(self.target, white)
+        # White frames at 5-9 in the first video and 20-24 in the second
+        for path, start in zip(self.videos, (5, 20)):
+            out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+            for f in range(30):
+                out.write(white if start <= f < start + 5 else np.zeros((48, 64, 3), np.uint8))
+            out.release()
+
+    def tearDown(self):
+        for f in [self.target] + self.videos:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def test_load_targets_reports_missing_images(self):
+        logs = []
+        targets = load_targets({self.target: "white", "missing.png": "missing"}, log=logs.append)
+        self.assertEqual(list(targets), ["white"])
+        self.assertIn("Error: Could not load target image missing.png", logs)
+
+    def test_scan_groups_ranges(self):
+        scanner = VideoScanner(FrameMatcher(), load_targets({self.target: "white"}))
+        results = scanner.scan(self.videos[0])
+        self.assertEqual(len(results["white"]), 1)
+        r = results["white"][0]
+        self.assertEqual((r["start_frame"], r["end_frame"]), (5, 9))
+        self.assertEqual(r["video"], "test_scan_a.avi")
+        self.assertEqual(r["video_info"]["total_frames"], 30)
+        self.assertEqual(r["video_info"]["codec"], "MJPG")
+
+    def test_static_frames_reuse_verdicts(self):
+        targets = load_targets({self.target: "white"})
+        for options in ({}, {"pipeline": 3, "match_threads": 2}):
+            expected = VideoScanner(FrameMatcher(), targets, **options).scan(self.videos[0])
+            matcher = FrameMatcher()
+            logs = []
+            gated = VideoScanner(matcher, targets, log=logs.append, static_tolerance=0.5, **options)
+            self.assertEqual(gated.scan(self.videos[0]), expected)
+            # Only the first frame and the two scene changes are matched
+            self.assertEqual(matcher.stats["frames"], 3)
+            self.assertIn("Reused verdicts for 27 of 30 frames in test_scan_a.avi with an unchanged picture", logs)
+
+    def test_load_regions_skips_invalid_regions(self):
+        logs = []
+        images = {self.target: "white"}
+        self.assertEqual(load_regions({self.target: (10, 10, 20, 20)}, images, log=logs.append),
+                         {"white": (10, 10, 20, 20)})
+        for region in [(60, 40, 10, 10), (0, 0, 0, 10), (-1, 0, 10, 10)]:
+            self.assertEqual(load_regions({self.target: region}, images, log=logs.append), {})
+        self.assertEqual(load_regions({self.target: np.zeros((48, 64), np.uint8)}, images, log=logs.append), {})
+        self.assertEqual(len(logs), 4)
+        self.assertIn("Error: Region of target 'white' ignored: the rectangle does not fit into the 64x48 image", logs)
+
+    def test_static_gate_is_off_for_region_targets(self):
+        # A corner bug too small to move the frame thumbnail by half a level
+        video, bug = "test_scan_bug.avi", "test_scan_bug.png"
+        target = np.zeros((540, 960, 3), np.uint8)
+        target[20:40, 900:940] = 255
+        cv2.imwrite(bug, target)
+        out = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (960, 540))
+        for f in range(40):
+            out.write(target if 10 <= f < 30 else np.zeros((540, 960, 3), np.uint8))
+        out.release()
+        try:
+            images = {bug: "bug"}
+            regions = load_regions({bug: (900, 20, 40, 20)}, images)
+            scanner = VideoScanner(FrameMatcher(), load_targets(images), regions=regions, static_tolerance=0.5)
+            runs = [(r["start_frame"], r["end_frame"]) for r in scanner.scan(video)["bug"]]
+            self.assertEqual(runs, [(10, 29)])
+        finally:
+            for f in (video, bug):
+                if os.path.exists(f):
+                    os.remove(f)
+
+    def test_stride_sampling_finds_exact_ranges(self):
+        targets = load_targets({self.target: "white"})
+        for path in self.videos:
+            expected = VideoScanner(FrameMatcher(), targets).scan(path)
+            matcher = FrameMatcher()
+            logs = []
+            sampled = VideoScanner(matcher, targets, log=logs.append, stride=4).scan(path)
+            self.assertEqual(sampled, expected)
+            self.assertLess(matcher.stats["frames"], 30)
+            self.assertTrue(any("(stride 4)" in line for line in logs))
+
+    def test_stride_sampling_checks_segment_tail(self):
+        # The range 5-9 starts inside the unsampled tail of the segment [0, 7)
+        matcher = FrameMatcher()
+        scanner = VideoScanner(matcher, load_targets({self.target: "white"}), stride=5)
+        runs = scanner.scan_matches(self.videos[0], 0, 7)
+        self.assertEqual([(r["start_frame"], r["end_frame"]) for r in runs["white"]], [(5, 6)])
+
+    def test_pipelined_scan_matches_serial_scan(self):
+        targets = load_targets({self.target: "white"})
+        for path in self.videos:
+            expected = VideoScanner(FrameMatcher(), targets).scan(path)
+            matcher = FrameMatcher(prefilter=True)
+            scanner = VideoScanner(matcher, targets, pipeline=4, match_threads=2)
+            self.assertEqual(scanner.scan(path), expected)
+            self.assertEqual(matcher.stats["frames"], 30)
+
+    def test_pipelined_scan_stops_when_asked(self):
+        calls = []
+        def should_continue():
+            calls.append(1)
+            return len(calls) <= 12
+
+        scanner = VideoScanner(FrameMatcher(), load_targets({self.target: "white"}),
+                               should_continue=should_continue, pipeline=2)
+        runs = scanner.scan_matches(self.videos[0])
+        self.assertEqual([(r["start_frame"], r["end_frame"]) for r in runs["white"]], [(5, 9)])
+        self.assertEqual(len(calls), 13)
+
+    def test_ffmpeg_source_scan_matches_opencv_scan(self):
+        targets = load_targets({self.target: "white"})
+        for path in self.videos:
+            expected = VideoScanner(FrameMatcher(), targets).scan(path)
+            scanner = VideoScanner(FrameMatcher(), targets, source="ffmpeg",
+                                   source_options={"scale": (32, 24), "gray": True})
+            ranges = scanner.scan(path)["white"]
+            self.assertEqual([(r["start_frame"], r["end_frame"]) for r in ranges],
+                             [(r["start_frame"], r["end_frame"]) for r in expected["white"]])
+
+    def test_scan_stops_when_asked(self):
+        scanner = VideoScanner(FrameMatcher(), load_targets({self.target: "white"}),
+                               should_continue=lambda: False)
+        self.assertEqual(scanner.scan(self.videos[0]), {"white": []})
+
+    def test_parallel_scan_matches_serial_scan(self):
+        matcher = FrameMatcher()
+        serial = VideoScanner(matcher, load_targets({self.target: "white"}))
+        expected = [serial.scan(path) for path in self.videos]
+
+        logs, progress = [], []
+        parallel = ParallelScanner(matcher, {self.target: "white"}, 2,
+                                   log=logs.append, progress=progress.append)
+        self.assertEqual(parallel.scan(self.videos), expected)
+        self.assertIn("Processing video: test_scan_b.avi", logs)
+        self.assertEqual(progress[-1], 100)
+
+    def test_parallel_scan_does_not_probe_in_parent(self):
+        from unittest.mock import patch
+        from src.probe import probe_cache
+        probe_cache.clear()
+        parallel = ParallelScanner(FrameMatcher(), {self.target: "white"}, 2)
+        with patch("src.probe.probe_video") as probe:
+            scanned = parallel.scan(self.videos)
+        probe.assert_not_called()
+        self.assertEqual(scanned[1]["white"][0]["video_info"]["total_frames"], 30)
+
+    def test_split_segments(self):
+        self.assertEqual(split_segments(3000, 3), [(0, 1000), (1000, 2000), (2000, None)])
+        self.assertEqual(split_segments(1500, 4), [(0, None)])
+        self.assertEqual(split_segments(0, 4), [(0, None)])
+
+    def test_segmented_scan_stitches_boundary_ranges(self):
+        matcher = FrameMatcher()
+        expected = VideoScanner(matcher, load_targets({self.target: "white"})).scan(self.videos[0])
+
+        # Four segments put a boundary at frame 8, inside the 5-9 range
+        parallel = ParallelScanner(matcher, {self.target: "white"}, 2, segments=4, min_segment_frames=7)
+        self.assertEqual(parallel._plan_jobs(self.videos[:1])[1][1], 8)
+        self.assertEqual(parallel.scan(self.videos[:1]), [expected])
+
+    def test_parallel_scan_stopped_before_start(self):
+        parallel = ParallelScanner(FrameMatcher(), {self.target: "white"}, 2)
+        parallel.stop()
+        self.assertEqual(parallel.scan(self.videos), [None, None])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import shutil
+import tempfile
+import cv2
+import numpy as np
+from src.matcher import FrameMatcher
+from src.scanner import VideoScanner, load_targets
+from src.signatures import SignatureStore, build_signatures, signature_dir
+
+class TestSignatures(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video = os.path.join(self.tmp_dir, "video.avi")
+        self.white = os.path.join(self.tmp_dir, "white.png")
+        self.gray = os.path.join(self.tmp_dir, "gray.png")
+
+        white = np.ones((48, 64, 3), np.uint8) * 255
+        gray = np.ones((48, 64, 3), np.uint8) * 128
+        cv2.imwrite(self.white, white)
+        cv2.imwrite(self.gray, gray)
+        out = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+        for f in range(40):
+            out.write(white if 5 <= f < 12 else gray if f >= 30 else np.zeros((48, 64, 3), np.uint8))
+        out.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_build_and_candidates(self):
+        directory = signature_dir(self.tmp_dir, self.video)
+        store = build_signatures(self.video, directory)
+        self.assertEqual(store.count, 40)
+        self.assertEqual(store.frame_shape, (48, 64, 3))
+        self.assertTrue(SignatureStore.exists(directory))
+
+        matcher = FrameMatcher()
+        prepared = matcher.prepare(load_targets({self.white: "white"}), store.frame_shape)
+        candidates = matcher.query_signatures(SignatureStore(directory), prepared)["white"]
+        self.assertTrue(set(range(5, 12)) <= set(candidates.tolist()))
+        self.assertNotIn(0, candidates)
+
+    def test_scan_with_signatures_matches_full_scan(self):
+        targets = load_targets({self.white: "white", self.gray: "gray"})
+        expected = VideoScanner(FrameMatcher(), targets).scan(self.video)
+
+        build_signatures(self.video, signature_dir(self.tmp_dir, self.video))
+        logs = []
+        scanner = VideoScanner(FrameMatcher(), targets, log=logs.append, signatures=self.tmp_dir)
+        self.assertEqual(scanner.scan(self.video), expected)
+        self.assertIn("Signatures left 17 of 40 frames of video.avi to confirm", logs)
+        self.assertFalse(any(line.startswith("Processing video") for line in logs))
+
+    def test_signatures_of_other_source_are_ignored(self):
+        build_signatures(self.video, signature_dir(self.tmp_dir, self.video))
+        scanner = VideoScanner(FrameMatcher(), load_targets({self.white: "white"}), signatures=self.tmp_dir,
+                               source="ffmpeg", source_options={"gray": True})
+        self.assertIsNone(scanner.find_signatures(self.video))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import cv2
+import numpy as np
+from src.sources import OpenCVSource, FFmpegSource, open_source
+
+class TestFrameSources(unittest.TestCase):
+    def setUp(self):
+        self.video = "test_source_frames.avi"
+        out = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 25.0, (64, 48))
+        for f in range(20):
+            out.write(np.full((48, 64, 3), f * 10, np.uint8))
+        out.release()
+
+    def tearDown(self):
+        if os.path.exists(self.video):
+            os.remove(self.video)
+
+    def read_all(self, source):
+        frames = []
+        buf = None
+        while True:
+            buf = source.read(buf)
+            if buf is None:
+                break
+            frames.append((source.timestamp(), float(buf.mean())))
+        source.release()
+        return frames
+
+    def test_ffmpeg_source_matches_opencv_source(self):
+        expected = self.read_all(OpenCVSource(self.video))
+        frames = self.read_all(FFmpegSource(self.video))
+        self.assertEqual(len(frames), 20)
+        for (t1, m1), (t2, m2) in zip(expected, frames):
+            self.assertAlmostEqual(t1, t2, places=3)
+            self.assertAlmostEqual(m1, m2, delta=3)
+
+    def test_ffmpeg_source_scales_and_converts_in_decoder(self):
+        source = FFmpegSource(self.video, scale=(32, 24), gray=True)
+        self.assertEqual(source.frame_count(), 20)
+        frame = source.read()
+        self.assertEqual(frame.shape, (24, 32))
+        reused = source.read(frame)
+        self.assertIs(reused, frame)
+        source.release()
+
+    def test_seek_and_grab(self):
+        for kind in ("opencv", "ffmpeg"):
+            source = open_source(self.video, kind)
+            source.seek(10)
+            self.assertTrue(source.grab())
+            frame = source.read()
+            self.assertAlmostEqual(float(frame.mean()), 110, delta=3)
+            self.assertAlmostEqual(source.timestamp(), 11 / 25.0, places=3)
+            source.release()
+
+    def test_ffmpeg_source_without_ffmpeg(self):
+        from unittest.mock import patch
+        with patch('subprocess.Popen', side_effect=FileNotFoundError("ffmpeg")):
+            source = FFmpegSource(self.video)
+        self.assertFalse(source.is_opened())
+        self.assertIsNone(source.read())
+        self.assertFalse(source.grab())
+        source.release()
+
+    def test_unknown_source(self):
+        with self.assertRaises(ValueError):
+            open_source(self.video, "gstreamer")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from src.target_index import dhash, hamming, MultiIndex, TargetIndex
+from src.matcher import FrameMatcher
+
+class TestTargetIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.images = [rng.integers(0, 256, (36, 64, 3), dtype=np.uint8) for _ in range(50)]
+
+    def test_dhash_is_stable_under_small_noise(self):
+        img = self.images[0]
+        noisy = np.clip(img.astype(int) + 2, 0, 255).astype(np.uint8)
+        self.assertLessEqual(hamming(dhash(img), dhash(noisy)), 4)
+        self.assertGreater(hamming(dhash(img), dhash(self.images[1])), 10)
+
+    def test_multi_index_search_matches_linear_scan(self):
+        hashes = [dhash(img) for img in self.images]
+        query = hashes[7]
+        for max_distance in (0, 5, 20, 32, 64):
+            index = MultiIndex(64, max_distance)
+            for i, h in enumerate(hashes):
+                index.add(h, i)
+            self.assertEqual(len(index), 50)
+            expected = sorted(i for i, h in enumerate(hashes) if hamming(query, h) <= max_distance)
+            found = sorted(i for _, i in index.search(query))
+            self.assertEqual(found, expected)
+
+    def test_multi_index_checks_few_hashes(self):
+        rng = np.random.default_rng(1)
+        index = MultiIndex(64, 6)
+        hashes = [int(h) for h in rng.integers(0, 1 << 63, 2000, dtype=np.int64)]
+        for i, h in enumerate(hashes):
+            index.add(h, i)
+        checked = [len(index.candidates(h)) for h in hashes[:100]]
+        self.assertLess(np.mean(checked), len(hashes) / 10)
+
+    def test_index_candidates(self):
+        index = TargetIndex(self.images, max_distance=4)
+        self.assertEqual(len(index), 50)
+        self.assertEqual(index.candidates(self.images[3]), [3])
+
+    def test_indexed_matcher_confirms_hits(self):
+        targets = {f"t{i}": img for i, img in enumerate(self.images)}
+        matcher = FrameMatcher(threshold=0.05, index=True)
+        prepared = matcher.prepare(targets, self.images[0].shape)
+        self.assertEqual(matcher.match(self.images[12], prepared), ["t12"])
+        self.assertEqual(matcher.match(np.zeros_like(self.images[0]), prepared), [])
+        self.assertEqual(matcher.stats["index_rejected"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import cv2
+import numpy as np
+from src.template_matcher import TemplateMatcher
+
+class TestTemplateMatcher(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        # A textured logo and a frame showing it at 75% size, off-centre
+        self.logo = cv2.GaussianBlur(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), (5, 5), 0)
+        self.frame = cv2.GaussianBlur(rng.integers(0, 256, (270, 480, 3), dtype=np.uint8), (5, 5), 0)
+        self.frame[150:198, 300:372] = cv2.resize(self.logo, (72, 48), interpolation=cv2.INTER_AREA)
+        self.empty = cv2.GaussianBlur(rng.integers(0, 256, (270, 480, 3), dtype=np.uint8), (5, 5), 0)
+
+    def test_finds_scaled_and_shifted_target(self):
+        matcher = TemplateMatcher(scales=(0.5, 0.75, 1.0))
+        prepared = matcher.prepare({"logo": self.logo}, self.frame.shape)
+        self.assertEqual(matcher.match(self.frame, prepared), ["logo"])
+        self.assertEqual(matcher.match(self.empty, prepared), [])
+        self.assertEqual(matcher.stats["coarse_rejected"], 1)
+        self.assertIs(matcher.prepare({"logo": self.logo}, self.frame.shape), prepared)
+
+    def test_search_window(self):
+        # Only the top left quarter is searched, the logo is bottom right
+        matcher = TemplateMatcher(scales=(0.75,), search_window=(0, 0, 0.5, 0.5))
+        prepared = matcher.prepare({"logo": self.logo}, self.frame.shape)
+        self.assertEqual(matcher.match(self.frame, prepared), [])
+
+        matcher = TemplateMatcher(scales=(0.75,), search_window=(0.5, 0.5, 0.5, 0.5))
+        self.assertEqual(matcher.match(self.frame, matcher.prepare({"logo": self.logo}, self.frame.shape)), ["logo"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 from PyQt6.QtCore import QThread, pyqtSignal, QObject
 from src.worker import FrameWorker
-from unittest.mock import MagicMock
+from src.matcher import RangeBuilder
+from unittest.mock import MagicMock, patch
 import numpy as np
 
 class TestFrameWorker(unittest.TestCase):
@@ -9,7 +10,8 @@ class TestFrameWorker(unittest.TestCase):
         # Mock dependencies
         matcher = MagicMock()
         matcher.compare.return_value = True
-        matcher.group_matches.return_value = [{"start_frame": 0, "end_frame": 1, "start_time": 0.0, "end_time": 0.1}]
+        matcher.match.return_value = ["alias"]
+        matcher.range_builder.side_effect = lambda on_range=None: RangeBuilder(on_range=on_range)
         
         worker = FrameWorker(["video.mp4"], {"image.png": "alias"}, matcher)
         
@@ -17,10 +19,12 @@ class TestFrameWorker(unittest.TestCase):
         progress_calls = []
         log_calls = []
         finished_calls = []
+        range_calls = []
         
         worker.progress.connect(lambda p: progress_calls.append(p))
         worker.log.connect(lambda l: log_calls.append(l))
         worker.finished.connect(lambda r: finished_calls.append(r))
+        worker.range_found.connect(lambda alias, r: range_calls.append((alias, r)))
         
         # We need to mock cv2.VideoCapture to avoid actual file I/O
         with unittest.mock.patch('cv2.VideoCapture') as mock_vc:
@@ -44,6 +48,41 @@ class TestFrameWorker(unittest.TestCase):
         self.assertIn("alias", finished_calls[0])
         # Verify 'video' key is present and correct
         self.assertEqual(finished_calls[0]["alias"][0]["video"], "video.mp4")
+        # Ranges are streamed out before the results are finished
+        self.assertEqual(range_calls, [("alias", finished_calls[0]["alias"][0])])
+
+    def test_logs_are_batched(self):
+        worker = FrameWorker(["video.mp4"], {"image.png": "alias"}, MagicMock())
+        log_calls = []
+        worker.log.connect(lambda l: log_calls.append(l))
+        for i in range(5):
+            worker._log(f"line {i}")
+        worker.flush_logs()
+        self.assertEqual(log_calls, ["line 0", "line 1\nline 2\nline 3\nline 4"])
+
+    def test_queued_logs_are_flushed_by_progress(self):
+        worker = FrameWorker(["video.mp4"], {"image.png": "alias"}, MagicMock())
+        log_calls = []
+        worker.log.connect(lambda l: log_calls.append(l))
+        seen = []
+
+        class Scanner:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def scan(self, video_path, progress=None):
+                worker._log("Processing video")
+                worker._log("Match found") # within LOG_INTERVAL, queued
+                progress(1, 10)
+                seen.append(list(log_calls))
+                worker._last_flush -= 1 # LOG_INTERVAL has passed
+                progress(2, 10)
+                seen.append(list(log_calls))
+                return {}
+
+        with patch("src.worker.VideoScanner", Scanner):
+            worker._scan_serial({}, {})
+        self.assertEqual(seen, [["Processing video"], ["Processing video", "Match found"]])
 
     def test_worker_stop(self):
         matcher = MagicMock()